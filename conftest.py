@@ -0,0 +1,10 @@
+import pytest
+
+from yatube.sandbox import temporary_storage
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _temporary_storage():
+    # то же, что TemporaryStorageRunner для manage.py test
+    with temporary_storage():
+        yield
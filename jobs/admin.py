@@ -0,0 +1,22 @@
+from django.contrib import admin
+
+from .models import Job, OutboxMessage
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('path', 'status', 'attempts', 'run_at', 'finished')
+    search_fields = ('path', 'dedupe_key')
+    list_filter = ('status', 'path')
+    empty_value_display = '-пусто-'
+
+
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'send_after')
+    search_fields = ('subject', 'recipients')
+    list_filter = ('status',)
+    exclude = ('message',)
+    empty_value_display = '-пусто-'
+
+
+admin.site.register(Job, JobAdmin)
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
@@ -0,0 +1,110 @@
+import pickle
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils import timezone
+
+from .models import OutboxMessage
+from .queue import backoff, enqueue
+
+DISPATCH_KEY = 'mail:dispatch'
+
+
+class OutboxBackend(BaseEmailBackend):
+    """
+    Сохраняет письма в таблицу OutboxMessage и ставит в очередь их отправку.
+
+    Запрос не ждёт почтовый сервер: письма отправляет dispatch()
+    в воркере очереди через OUTBOX_EMAIL_BACKEND.
+    """
+
+    def send_messages(self, email_messages):
+        rows = []
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            # соединение отправителя не сериализуется и воркеру не нужно
+            message.connection = None
+            rows.append(OutboxMessage(message=pickle.dumps(message, pickle.HIGHEST_PROTOCOL),
+                                      subject=message.subject[:255], recipients=', '.join(message.recipients())))
+        if not rows:
+            return 0
+        OutboxMessage.objects.bulk_create(rows)
+        schedule_dispatch()
+        return len(rows)
+
+
+def schedule_dispatch():
+    # пока отправка ждёт в очереди, новые письма уйдут с ней же
+    enqueue('jobs.mail.dispatch', dedupe_key=DISPATCH_KEY, delay=settings.OUTBOX_DELAY)
+
+
+def _claim(now):
+    ready = OutboxMessage.objects.filter(status=OutboxMessage.QUEUED, send_after__lte=now).order_by('pk')
+    pks = list(ready.values_list('pk', flat=True)[:settings.OUTBOX_BATCH_SIZE])
+    OutboxMessage.objects.filter(pk__in=pks, status=OutboxMessage.QUEUED).update(
+        status=OutboxMessage.SENDING, claimed=now)
+    return list(OutboxMessage.objects.filter(pk__in=pks, status=OutboxMessage.SENDING, claimed=now))
+
+
+def _failed(message, error):
+    message.attempts += 1
+    message.error = error
+    if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        message.status = OutboxMessage.FAILED
+    else:
+        message.status = OutboxMessage.QUEUED
+        message.send_after = timezone.now() + timedelta(seconds=backoff(message.attempts))
+    message.save(update_fields=['attempts', 'error', 'status', 'send_after'])
+
+
+def dispatch():
+    """
+    Отправляет готовые письма пачками по OUTBOX_BATCH_SIZE через одно соединение.
+
+    Письмо, которое не удалось отправить, откладывается с экспоненциальной
+    паузой и после OUTBOX_MAX_ATTEMPTS попыток помечается как неудачное.
+    Возвращает число отправленных писем.
+    """
+    sent = 0
+    connection = get_connection(settings.OUTBOX_EMAIL_BACKEND)
+    batch = _claim(timezone.now())
+    if not batch:
+        return sent
+    try:
+        connection.open()
+    except Exception:
+        # сервер недоступен: откладываем всю пачку, задачу повторит очередь
+        error = traceback.format_exc()
+        for message in batch:
+            _failed(message, error)
+        raise
+    try:
+        while batch:
+            for message in batch:
+                try:
+                    connection.send_messages([pickle.loads(message.message)])
+                except Exception:
+                    _failed(message, traceback.format_exc())
+                else:
+                    message.delete()
+                    sent += 1
+            batch = _claim(timezone.now())
+    finally:
+        connection.close()
+    return sent
+
+
+def requeue_stale():
+    """
+    Возвращает в очередь письма, воркер которых упал посреди отправки,
+    и планирует отправку, если готовые письма остались без неё.
+    """
+    claimed = timezone.now() - timedelta(seconds=settings.JOBS_TIMEOUT)
+    OutboxMessage.objects.filter(status=OutboxMessage.SENDING, claimed__lt=claimed).update(
+        status=OutboxMessage.QUEUED)
+    if OutboxMessage.objects.filter(status=OutboxMessage.QUEUED, send_after__lte=timezone.now()).exists():
+        schedule_dispatch()
@@ -0,0 +1,76 @@
+import multiprocessing
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.utils import timezone
+
+from jobs import mail, queue
+from yatube.metrics import registry
+
+
+def _thread_worker(stop, interval, once):
+    try:
+        queue.work(stop, interval, once)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры очереди задач и периодически печатает глубину очереди и задержку'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.JOBS_WORKERS)
+        parser.add_argument('--processes', action='store_true', help='Процессы вместо потоков')
+        parser.add_argument('--interval', type=float, default=1.0, help='Пауза опроса пустой очереди, с')
+        parser.add_argument('--report', type=float, default=10.0, help='Период отчёта, с')
+        parser.add_argument('--once', action='store_true', help='Выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        queue.requeue_stale()
+        mail.requeue_stale()
+        since = timezone.now()
+        interval, once = options['interval'], options['once']
+
+        if options['processes']:
+            # дочерние процессы открывают свои соединения с базой и не сбрасывают чужие метрики
+            connections.close_all()
+            registry.flush()
+            context = multiprocessing.get_context('fork')
+            stop = context.Event()
+            workers = [context.Process(target=queue.work, args=(stop, interval, once))
+                       for _ in range(options['workers'])]
+        else:
+            stop = threading.Event()
+            workers = [threading.Thread(target=_thread_worker, args=(stop, interval, once), name=f'jobs-{number}')
+                       for number in range(options['workers'])]
+        for worker in workers:
+            worker.start()
+
+        try:
+            while any(worker.is_alive() for worker in workers):
+                for worker in workers:
+                    worker.join(options['report'] / len(workers))
+                since = self.report(since)
+                queue.requeue_stale()
+                queue.purge_done()
+                mail.requeue_stale()
+        except KeyboardInterrupt:
+            self.stdout.write('Останавливаем воркеры после текущих задач...')
+            stop.set()
+            for worker in workers:
+                worker.join()
+            self.report(since)
+
+    def report(self, since):
+        now = timezone.now()
+        stats = queue.stats(since)
+        self.stdout.write(
+            f'{time.strftime("%H:%M:%S")} готовы {stats["ready"]}, отложены {stats["delayed"]}, '
+            f'выполняются {stats["running"]}, с ошибкой {stats["failed"]}, '
+            f'дольше всех ждёт {stats["oldest_wait"]:.1f} с; '
+            f'запущено {stats["started"]}, задержка средняя {stats["latency_avg"]:.2f} с, '
+            f'максимальная {stats["latency_max"]:.2f} с')
+        return now
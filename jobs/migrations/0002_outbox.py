@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:08
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.BinaryField()),
+                ('subject', models.CharField(blank=True, max_length=255)),
+                ('recipients', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('sending', 'Отправляется'), ('failed', 'Ошибка')], default='queued', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('send_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed', models.DateTimeField(blank=True, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(fields=['status', 'send_after'], name='jobs_outbox_status_e1fd20_idx'),
+        ),
+    ]
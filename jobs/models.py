@@ -0,0 +1,76 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Отложенный вызов функции по пути импорта, аргументы хранятся в JSON.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    path = models.CharField(max_length=200)
+    args = models.TextField(default='[]')
+    kwargs = models.TextField(default='{}')
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+        constraints = [
+            # одинаковая задача может ждать или выполняться только одна
+            models.UniqueConstraint(fields=['dedupe_key'], condition=models.Q(status__in=['queued', 'running']),
+                                    name='unique_pending_job'),
+        ]
+
+    def __str__(self):
+        return f'{self.path} ({self.status})'
+
+
+class OutboxMessage(models.Model):
+    """
+    Письмо, ожидающее отправки; сам EmailMessage хранится в pickle.
+    """
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'В очереди'),
+        (SENDING, 'Отправляется'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    message = models.BinaryField()
+    subject = models.CharField(max_length=255, blank=True)
+    recipients = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    send_after = models.DateTimeField(default=timezone.now)
+    claimed = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'send_after']),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} → {self.recipients}'
@@ -0,0 +1,140 @@
+import json
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from yatube.metrics import registry
+from .models import Job
+
+
+def enqueue(path, args=(), kwargs=None, dedupe_key=None, delay=0, max_attempts=None):
+    """
+    Ставит в очередь вызов функции по пути импорта.
+
+    Задача видна воркерам после коммита текущей транзакции. Пока задача
+    с тем же dedupe_key ждёт или выполняется, возвращается она, а новая не создаётся.
+    """
+    job = Job(path=path, args=json.dumps(list(args)), kwargs=json.dumps(kwargs or {}), dedupe_key=dedupe_key,
+              run_at=timezone.now() + timedelta(seconds=delay),
+              max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS)
+    if dedupe_key is None:
+        job.save()
+        return job
+    while True:
+        try:
+            with transaction.atomic():
+                job.save()
+            return job
+        except IntegrityError:
+            job.pk = None
+            existing = Job.objects.filter(dedupe_key=dedupe_key, status__in=[Job.QUEUED, Job.RUNNING]).first()
+            # задача могла завершиться между вставкой и чтением, тогда пробуем вставить ещё раз
+            if existing is not None:
+                return existing
+
+
+def backoff(attempts):
+    delay = min(settings.JOBS_BACKOFF_MAX, settings.JOBS_BACKOFF * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1)
+
+
+def claim():
+    """
+    Забирает самую давнюю готовую к запуску задачу или возвращает None.
+    """
+    now = timezone.now()
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at')
+    for pk in ready.values_list('pk', flat=True)[:10]:
+        # другой воркер мог забрать задачу раньше: тогда UPDATE ничего не изменит
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, started=now, attempts=F('attempts') + 1)
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job):
+    """
+    Выполняет задачу; при ошибке откладывает её с экспоненциальной паузой,
+    а после max_attempts попыток помечает как неудачную.
+    """
+    labels = f'job="{job.path}"'
+    registry.observe('yatube_job_latency_seconds', labels, (job.started - job.run_at).total_seconds())
+    started = time.perf_counter()
+    try:
+        func = import_string(job.path)
+        func(*json.loads(job.args), **json.loads(job.kwargs))
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            status = Job.FAILED
+            Job.objects.filter(pk=job.pk).update(status=status, error=error, finished=timezone.now())
+        else:
+            status = 'retry'
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, error=error, run_at=timezone.now() + timedelta(seconds=backoff(job.attempts)))
+    else:
+        status = Job.DONE
+        Job.objects.filter(pk=job.pk).update(status=status, error='', finished=timezone.now())
+    registry.observe('yatube_job_duration_seconds', labels, time.perf_counter() - started)
+    registry.add('yatube_jobs_total', f'{labels},status="{status}"')
+    return status
+
+
+def work(stop, interval, once=False):
+    """
+    Цикл воркера: выполняет задачи, пока не установлен stop.
+    С once=True завершается, как только очередь опустеет.
+    """
+    while not stop.is_set():
+        job = claim()
+        if job is None:
+            if once:
+                break
+            stop.wait(interval)
+            continue
+        run(job)
+        registry.maybe_flush()
+    registry.flush()
+
+
+def requeue_stale():
+    """
+    Возвращает в очередь задачи, воркер которых завис или упал.
+    """
+    started = timezone.now() - timedelta(seconds=settings.JOBS_TIMEOUT)
+    return Job.objects.filter(status=Job.RUNNING, started__lt=started).update(status=Job.QUEUED)
+
+
+def purge_done():
+    finished = timezone.now() - timedelta(seconds=settings.JOBS_KEEP_DONE)
+    return Job.objects.filter(status=Job.DONE, finished__lt=finished).delete()[0]
+
+
+def stats(since):
+    """
+    Глубина очереди по статусам и задержка запуска задач, начатых после since.
+    """
+    now = timezone.now()
+    counts = dict(Job.objects.order_by().values_list('status').annotate(Count('pk')))
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).aggregate(count=Count('pk'), oldest=Min('run_at'))
+    oldest = ready['oldest']
+    waits = [(started - run_at).total_seconds()
+             for run_at, started in Job.objects.filter(started__gte=since).values_list('run_at', 'started')]
+    return {
+        'ready': ready['count'],
+        'delayed': counts.get(Job.QUEUED, 0) - ready['count'],
+        'running': counts.get(Job.RUNNING, 0),
+        'failed': counts.get(Job.FAILED, 0),
+        'oldest_wait': (now - oldest).total_seconds() if oldest else 0.0,
+        'started': len(waits),
+        'latency_avg': sum(waits) / len(waits) if waits else 0.0,
+        'latency_max': max(waits, default=0.0),
+    }
@@ -0,0 +1,146 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from yatube.context_processor import send_mail
+from . import mail as outbox, queue
+from .management.commands.run_workers import Command
+from .models import Job, OutboxMessage
+
+calls = []
+opened = []
+
+
+class FlakyBackend(EmailBackend):
+    # считает открытые соединения и отказывает адресу bounce@example.com
+    def open(self):
+        opened.append(self)
+        if getattr(settings, 'OUTBOX_TEST_DOWN', False):
+            raise ConnectionError('сервер недоступен')
+
+    def send_messages(self, messages):
+        if 'bounce@example.com' in messages[0].recipients():
+            raise OSError('адрес не существует')
+        return super().send_messages(messages)
+
+
+def record(*args, **kwargs):
+    calls.append((args, kwargs))
+
+
+def fail():
+    raise RuntimeError('сломалось')
+
+
+class TestQueue(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_work_and_report(self):
+        since = timezone.now()
+        queue.enqueue('jobs.tests.record', [1, 'a'], {'b': 2})
+        queue.enqueue('jobs.tests.record', [2], delay=60)
+        # воркеры команды работают в своих потоках и не видят незакоммиченные данные теста
+        queue.work(threading.Event(), 0, once=True)
+        out = StringIO()
+        Command(stdout=out).report(since)
+        self.assertEqual(calls, [((1, 'a'), {'b': 2})])
+        self.assertIn('отложены 1', out.getvalue())
+        self.assertIn('запущено 1', out.getvalue())
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 1)
+
+    def test_dedupe(self):
+        first = queue.enqueue('jobs.tests.record', [1], dedupe_key='same')
+        second = queue.enqueue('jobs.tests.record', [2], dedupe_key='same')
+        self.assertEqual(first.pk, second.pk)
+        queue.run(queue.claim())
+
+        # после выполнения такую же задачу снова можно поставить
+        third = queue.enqueue('jobs.tests.record', [3], dedupe_key='same')
+        self.assertNotEqual(third.pk, first.pk)
+
+    def test_claim_once(self):
+        queue.enqueue('jobs.tests.record')
+        self.assertIsNotNone(queue.claim())
+        self.assertIsNone(queue.claim())
+
+    @override_settings(JOBS_BACKOFF=10)
+    def test_retry_with_backoff(self):
+        job = queue.enqueue('jobs.tests.fail', max_attempts=2)
+        self.assertEqual(queue.run(queue.claim()), 'retry')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('сломалось', job.error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=4))
+        self.assertIsNone(queue.claim())
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual(queue.run(queue.claim()), Job.FAILED)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    @override_settings(JOBS_TIMEOUT=60)
+    def test_requeue_stale(self):
+        job = queue.enqueue('jobs.tests.record')
+        queue.claim()
+        Job.objects.filter(pk=job.pk).update(started=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(queue.requeue_stale(), 1)
+        self.assertEqual(queue.claim().pk, job.pk)
+
+
+@override_settings(EMAIL_BACKEND='jobs.mail.OutboxBackend', OUTBOX_EMAIL_BACKEND='jobs.tests.FlakyBackend',
+                   OUTBOX_DELAY=0, OUTBOX_BATCH_SIZE=2)
+class TestOutbox(TestCase):
+    def setUp(self):
+        opened.clear()
+
+    def test_batches_over_one_connection(self):
+        for number in range(5):
+            mail.send_mail(f'Письмо {number}', 'Текст', 'from@example.com', [f'user{number}@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxMessage.objects.count(), 5)
+        self.assertEqual(Job.objects.count(), 1)
+
+        self.assertEqual(queue.run(queue.claim()), Job.DONE)
+        self.assertEqual([message.subject for message in mail.outbox], [f'Письмо {number}' for number in range(5)])
+        self.assertEqual(len(opened), 1)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_context_processor_helper(self):
+        self.assertEqual(send_mail(None), {})
+        self.assertEqual(OutboxMessage.objects.get().recipients, 'to@example.com')
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_retry_failed_message(self):
+        mail.send_mail('Отказ', 'Текст', 'from@example.com', ['bounce@example.com'])
+        mail.send_mail('Доставка', 'Текст', 'from@example.com', ['user@example.com'])
+        self.assertEqual(outbox.dispatch(), 1)
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.status, message.attempts), (OutboxMessage.QUEUED, 1))
+        self.assertIn('адрес не существует', message.error)
+        self.assertGreater(message.send_after, timezone.now())
+
+        OutboxMessage.objects.update(send_after=timezone.now())
+        self.assertEqual(outbox.dispatch(), 0)
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.FAILED)
+
+    @override_settings(OUTBOX_TEST_DOWN=True)
+    def test_server_down(self):
+        mail.send_mail('Письмо', 'Текст', 'from@example.com', ['user@example.com'])
+        self.assertEqual(queue.run(queue.claim()), 'retry')
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.status, message.attempts), (OutboxMessage.QUEUED, 1))
+
+    def test_requeue_stale(self):
+        mail.send_mail('Письмо', 'Текст', 'from@example.com', ['user@example.com'])
+        Job.objects.all().delete()
+        OutboxMessage.objects.update(status=OutboxMessage.SENDING, claimed=timezone.now() - timedelta(hours=1))
+        outbox.requeue_stale()
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.QUEUED)
+        self.assertEqual(Job.objects.get().path, 'jobs.mail.dispatch')
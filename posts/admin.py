@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Post, Group, Comment, Follow
 
 
@@ -9,6 +10,11 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug')
@@ -0,0 +1,95 @@
+import math
+import random
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .models import User, Group, Post
+
+VIEWS = ['index', 'group_posts', 'profile', 'post_view', 'follow_index', 'add_comment']
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def _requests(view, rng, seeded):
+    """
+    Случайный запрос к представлению: (метод, адрес, данные, нужен ли вход).
+    """
+    post = Post.objects.select_related('author').get(pk=rng.choice(seeded['posts']))
+    if view == 'index':
+        return 'get', f'/?page={rng.randint(1, 50)}', None, False
+    if view == 'group_posts':
+        return 'get', f'/group/{Group.objects.get(pk=rng.choice(seeded["groups"])).slug}/', None, False
+    if view == 'profile':
+        return 'get', f'/{post.author.username}/', None, False
+    if view == 'post_view':
+        return 'get', f'/{post.author.username}/{post.pk}/', None, False
+    if view == 'follow_index':
+        return 'get', '/follow/', None, True
+    if view == 'add_comment':
+        return 'post', f'/{post.author.username}/{post.pk}/comment/', {'text': 'Бенчмарк'}, True
+    raise ValueError(view)
+
+
+def run(seeded, requests=100, views=VIEWS, cold=False, random_seed=0):
+    """
+    Прогоняет запросы к представлениям через тестовый клиент и
+    возвращает перцентили задержки и число SQL-запросов.
+    """
+    rng = random.Random(random_seed)
+    anonymous = Client()
+    user = Client()
+    user.force_login(User.objects.get(pk=seeded['users'][0]))
+
+    results = {}
+    for view in views:
+        cache.clear()
+        latencies, queries = [], []
+        for _ in range(requests):
+            method, url, data, login = _requests(view, rng, seeded)
+            client = user if login else anonymous
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{view}: {url} вернул {response.status_code}')
+            queries.append(len(captured))
+
+        results[view] = {
+            'requests': requests,
+            'mean_ms': sum(latencies) / len(latencies),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'queries_p50': percentile(queries, 50),
+            'queries_max': max(queries),
+        }
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Возвращает список регрессий относительно прошлого прогона.
+    """
+    regressions = []
+    for view, old in baseline.items():
+        new = results.get(view)
+        if new is None:
+            continue
+        if new['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{view}: p95 {old["p95_ms"]:.1f} -> {new["p95_ms"]:.1f} мс')
+        if new['queries_max'] > old['queries_max']:
+            regressions.append(f'{view}: запросов {old["queries_max"]} -> {new["queries_max"]}')
+    return regressions
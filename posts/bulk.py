@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+
+from . import search, stats, timeline
+from .cache import bump_generation
+
+
+@contextmanager
+def preserve_dates(model, *field_names):
+    """
+    Временно отключает auto_now/auto_now_add, чтобы bulk_create
+    сохранил даты из загружаемых данных.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def rebuild_derived():
+    """
+    Пересчитывает данные, которые обычно поддерживают сигналы:
+    bulk_create сигналов не отправляет.
+    """
+    result = {
+        'timeline': timeline.rebuild(),
+        'stats': stats.reconcile(),
+        'search': search.rebuild() if search.available() else None,
+    }
+    bump_generation()
+    return result
@@ -0,0 +1,134 @@
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from yatube.metrics import record_cache
+from yatube.routers import set_replica
+from . import holes
+
+GENERATION_KEY = 'posts:generation'
+PAGE_KEY_PREFIX = 'posts:page'
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # стартуем со времени, чтобы не вернуться к старому поколению после вытеснения ключа
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        get_generation()
+
+
+def should_refresh(entry, now, beta=1.0):
+    """
+    Вероятностное досрочное устаревание (XFetch): чем дольше считается
+    страница и чем ближе срок, тем вероятнее пересчёт до истечения.
+    """
+    return now - entry['delta'] * beta * math.log(random.random() or 1e-12) >= entry['expires']
+
+
+def _is_cacheable(response):
+    if response.streaming or response.status_code != 200:
+        return False
+    # общая страница не должна раздавать чужие куки
+    if response.cookies:
+        return False
+    return 'private' not in response.get('Cache-Control', ())
+
+
+def _personalize(request, response):
+    """
+    Подставляет в общую страницу части для текущего пользователя.
+    """
+    if not response.streaming and response.get('Content-Type', '').startswith('text/html'):
+        response.content = holes.fill(response.content.decode(response.charset), request)
+    patch_vary_headers(response, ['Cookie'])
+    # срок жизни в серверном кеше не должен доходить до браузера: после записи
+    # или выхода он показал бы свою устаревшую копию
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def single_flight_cache_page(timeout, stale_timeout=None, beta=None):
+    """
+    Замена cache_page с защитой от лавины пересчётов.
+
+    Страница в кеше одна на адрес и не зависит от пользователя: вместо
+    навигации, меню и кнопок правки в ней метки, которые заполняются
+    при каждом ответе (см. posts/holes.py).
+
+    Запись хранит поколение постов и мягкий срок годности. Устаревшую
+    запись (истёк срок или сменилось поколение) пересчитывает только
+    запрос, взявший блокировку в кеше, остальные получают прежнюю
+    страницу. Если записи нет совсем, ждут пересчёта не дольше
+    PAGE_CACHE_LOCK_TIMEOUT секунд.
+    """
+    if stale_timeout is None:
+        stale_timeout = settings.PAGE_CACHE_STALE_TIMEOUT
+    if beta is None:
+        beta = settings.PAGE_CACHE_XFETCH_BETA
+    lock_timeout = settings.PAGE_CACHE_LOCK_TIMEOUT
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            key = f'{PAGE_KEY_PREFIX}:{hashlib.md5(request.build_absolute_uri().encode()).hexdigest()}'
+            lock_key = f'{key}:lock'
+            generation = get_generation()
+            entry = cache.get(key)
+            if entry is not None and entry['generation'] == generation \
+                    and not should_refresh(entry, time.time(), beta):
+                record_cache('page', hits=1)
+                return _personalize(request, entry['response'])
+
+            locked = cache.add(lock_key, 1, lock_timeout)
+            if not locked and entry is None:
+                deadline = time.monotonic() + lock_timeout
+                while entry is None and cache.get(lock_key) is not None and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    entry = cache.get(key)
+            if not locked and entry is not None:
+                # страницу уже пересчитывает другой запрос, отдаём то, что есть
+                record_cache('page', hits=1)
+                return _personalize(request, entry['response'])
+
+            record_cache('page', misses=1)
+            # общая страница строится только с основной базы: отстающая реплика
+            # сохранила бы под новым поколением старые данные, и автор не увидел бы свою запись
+            set_replica(None)
+            request.punch_holes = True
+            try:
+                started = time.monotonic()
+                response = view(request, *args, **kwargs)
+                delta = time.monotonic() - started
+                if _is_cacheable(response):
+                    hard_timeout = timeout + stale_timeout
+                    cache.set(key, {
+                        'response': response,
+                        'generation': generation,
+                        'expires': time.time() + timeout,
+                        'delta': delta,
+                    }, hard_timeout)
+            finally:
+                request.punch_holes = False
+                if locked:
+                    cache.delete(lock_key)
+            return _personalize(request, response)
+        return wrapper
+    return decorator
@@ -0,0 +1,45 @@
+import hashlib
+
+from django.db.models import Count, Max
+
+from .models import Post, Group, UserStats
+from .stats import COUNTERS
+
+
+def _etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _user_stats(username):
+    # имя и фамилия выводятся в заголовке и карточке пользователя
+    return (UserStats.objects.filter(user__username=username)
+            .values_list(*COUNTERS, 'user__first_name', 'user__last_name').first())
+
+
+def post_etag(request, username, post_id):
+    # без first(): сортировка по pk заставила бы SQLite строить временное B-дерево
+    rows = list(Post.objects.filter(pk=post_id, author__username=username)
+                .annotate(comments=Count('post')).values_list('modified', 'comments'))
+    if not rows:
+        return None
+    modified, comments = rows[0]
+    return _etag(modified, comments, _user_stats(username), request.user.pk)
+
+
+def profile_etag(request, username):
+    posts = Post.objects.filter(author__username=username).aggregate(
+        last_pub_date=Max('pub_date'), last_modified=Max('modified'))
+    stats = _user_stats(username)
+    if stats is None:
+        return None
+    return _etag(posts['last_pub_date'], posts['last_modified'], stats, request.user.pk)
+
+
+def group_etag(request, slug):
+    group = Group.objects.filter(slug=slug).values_list('pk', 'title', 'description').first()
+    if group is None:
+        return None
+    posts = Post.objects.filter(group=group[0]).aggregate(
+        last_pub_date=Max('pub_date'), last_modified=Max('modified'), count=Count('pk'))
+    return _etag(group, posts['last_pub_date'], posts['last_modified'], posts['count'], request.user.pk)
+
@@ -0,0 +1,88 @@
+import datetime as dt
+import json
+import zlib
+from collections import defaultdict
+from itertools import islice
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Post, Comment
+
+
+def parse_bound(value, end=False):
+    """
+    Принимает дату (YYYY-MM-DD) или дату и время в ISO 8601.
+    Для конца периода дата без времени включает весь день.
+    """
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Неверная дата: {value}')
+        moment = dt.datetime.combine(day + dt.timedelta(days=1) if end else day, dt.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.utc)
+    return moment
+
+
+def filter_posts(author=None, group=None, since=None, until=None):
+    posts = Post.objects.select_related('author', 'group').order_by('pk')
+    if author:
+        posts = posts.filter(author__username=author)
+    if group:
+        posts = posts.filter(group__slug=group)
+    if since:
+        posts = posts.filter(pub_date__gte=parse_bound(since))
+    if until:
+        posts = posts.filter(pub_date__lt=parse_bound(until, end=True))
+    return posts
+
+
+def records(posts, chunk_size=1000):
+    """
+    Отдает посты с комментариями по одному, держа в памяти одну пачку.
+    """
+    iterator = posts.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+
+        comments = defaultdict(list)
+        chunk_comments = (Comment.objects.filter(post_id__in=[post.pk for post in chunk])
+                          .select_related('author').order_by('created', 'pk'))
+        for comment in chunk_comments.iterator(chunk_size=chunk_size):
+            comments[comment.post_id].append({
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            })
+
+        for post in chunk:
+            yield {
+                'id': post.pk,
+                'text': post.text,
+                'pub_date': post.pub_date.isoformat(),
+                'author': {'id': post.author_id, 'username': post.author.username},
+                'group': {'slug': post.group.slug, 'title': post.group.title} if post.group else None,
+                'image': post.image.name or None,
+                'comments': comments[post.pk],
+            }
+
+
+def ndjson(rows):
+    for row in rows:
+        yield (json.dumps(row, ensure_ascii=False) + '\n').encode()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
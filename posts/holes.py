@@ -0,0 +1,62 @@
+import re
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+HOLE_RE = re.compile(r'<!--hole:(.*?)-->')
+
+RENDERERS = {}
+
+
+def renderer(name):
+    def decorator(func):
+        RENDERERS[name] = func
+        return func
+    return decorator
+
+
+@renderer('nav')
+def render_nav(request):
+    return render_to_string('nav.html', request=request)
+
+
+@renderer('menu')
+def render_menu(request):
+    return render_to_string('menu.html', request=request)
+
+
+@renderer('edit')
+def render_edit(request, author_id, username, post_id):
+    user = getattr(request, 'user', None)
+    if user is None or str(user.pk) != author_id:
+        return ''
+    return render_to_string('post_edit_button.html', {'username': username, 'post_id': post_id})
+
+
+def marker(name, *args):
+    """
+    Метка на месте персональной части страницы, её заполняет fill().
+    """
+    return mark_safe('<!--hole:%s-->' % ':'.join(str(part) for part in (name,) + args))
+
+
+def render(name, request, *args):
+    return RENDERERS[name](request, *(str(arg) for arg in args))
+
+
+def fill(content, request):
+    """
+    Заменяет метки на части страницы для пользователя из request.
+    """
+    def replace(match):
+        name, *args = match.group(1).split(':')
+        return RENDERERS[name](request, *args)
+    return HOLE_RE.sub(replace, content)
+
+
+def is_punching(context):
+    """
+    Страница рисуется для общего кеша: вместо персональных частей ставим метки.
+    """
+    request = context.get('request')
+    return context.get('punch_holes', False) or getattr(request, 'punch_holes', False)
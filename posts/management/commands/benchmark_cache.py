@@ -0,0 +1,84 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from yatube.sqlite_cache import SQLiteCache
+
+BACKENDS = ['locmem', 'filebased', 'sqlite']
+OPERATIONS = ['set', 'get', 'get_many', 'incr']
+
+
+def make_cache(backend, directory, max_entries):
+    params = {'OPTIONS': {'MAX_ENTRIES': max_entries}}
+    if backend == 'locmem':
+        return LocMemCache('benchmark', params)
+    if backend == 'filebased':
+        return FileBasedCache(os.path.join(directory, 'filebased'), params)
+    return SQLiteCache(os.path.join(directory, 'cache.sqlite3'), params)
+
+
+def run_operations(cache, operations, keys, value):
+    """
+    Выполняет операции над кешем и возвращает число операций в секунду для каждой.
+    """
+    results = {}
+    for operation in operations:
+        started = time.perf_counter()
+        if operation == 'set':
+            for key in keys:
+                cache.set(key, value)
+        elif operation == 'get':
+            for key in keys:
+                cache.get(key)
+        elif operation == 'get_many':
+            for start in range(0, len(keys), 10):
+                cache.get_many(keys[start:start + 10])
+        elif operation == 'incr':
+            cache.set('counter', 0)
+            for _ in keys:
+                cache.incr('counter')
+        results[operation] = len(keys) / (time.perf_counter() - started)
+    return results
+
+
+def _worker(args):
+    backend, directory, max_entries, operations, keys, value = args
+    return run_operations(make_cache(backend, directory, max_entries), operations, keys, value)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает производительность кеша SQLite с LocMemCache и FileBasedCache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS)
+        parser.add_argument('--operations', nargs='+', choices=OPERATIONS, default=OPERATIONS)
+        parser.add_argument('--keys', type=int, default=2000, help='Ключей на процесс')
+        parser.add_argument('--value-size', type=int, default=4096, help='Размер значения, байт')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Параллельных процессов; LocMemCache у каждого свой')
+
+    def handle(self, *args, **options):
+        value = 'x' * options['value_size']
+        processes = options['processes']
+        max_entries = options['keys'] * processes * 2
+
+        self.stdout.write(f'{"кеш":>10} ' + ' '.join(f'{operation:>12}' for operation in options['operations'])
+                          + '   (операций в секунду на все процессы)')
+        for backend in options['backends']:
+            with tempfile.TemporaryDirectory() as directory:
+                tasks = [(backend, directory, max_entries, options['operations'],
+                          [f'key:{index}:{number}' for number in range(options['keys'])], value)
+                         for index in range(processes)]
+                if processes == 1:
+                    results = [_worker(tasks[0])]
+                else:
+                    with multiprocessing.get_context('fork').Pool(processes) as pool:
+                        results = pool.map(_worker, tasks)
+            totals = {operation: sum(row[operation] for row in results) for operation in options['operations']}
+            self.stdout.write(f'{backend:>10} ' + ' '.join(f'{totals[operation]:12.0f}'
+                                                          for operation in options['operations']))
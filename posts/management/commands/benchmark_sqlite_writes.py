@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections, transaction
+
+ENGINES = {
+    'default': 'django.db.backends.sqlite3',
+    'production': 'yatube.sqlite_backend',
+}
+
+
+def configure(engine, path):
+    alias = f'benchmark_{engine}'
+    connections.databases[alias] = {
+        'ENGINE': ENGINES[engine],
+        'NAME': path,
+        'CONN_MAX_AGE': None if engine == 'production' else 0,
+    }
+    return alias, connections[alias]
+
+
+def prepare(engine, path):
+    _, connection = configure(engine, path)
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER, text TEXT)')
+        cursor.execute('CREATE TABLE stats (post_id INTEGER PRIMARY KEY, comments INTEGER)')
+        cursor.executemany('INSERT INTO stats VALUES (%s, 0)', [(post_id,) for post_id in range(100)])
+    connection.close()
+
+
+def _worker(args):
+    """
+    Пишет как add_comment: читает пост, затем добавляет комментарий
+    и увеличивает счётчик в одной транзакции.
+    Возвращает (успешных записей, ошибок блокировки).
+    """
+    engine, path, writes, worker = args
+    alias, connection = configure(engine, path)
+    done = failed = 0
+    for number in range(writes):
+        post_id = (worker * writes + number) % 100
+        try:
+            with transaction.atomic(using=alias), connection.cursor() as cursor:
+                cursor.execute('SELECT comments FROM stats WHERE post_id = %s', [post_id])
+                cursor.execute('INSERT INTO comment (post_id, text) VALUES (%s, %s)', [post_id, 'x' * 200])
+                cursor.execute('UPDATE stats SET comments = comments + 1 WHERE post_id = %s', [post_id])
+            done += 1
+        except DatabaseError:
+            failed += 1
+        if engine == 'default':
+            # без CONN_MAX_AGE Django закрывает соединение после каждого запроса
+            connection.close()
+    connection.close()
+    return done, failed
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость конкурентной записи в SQLite в обычном и боевом режиме'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help='Транзакций на процесс')
+        parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        for engine in options['engines']:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                tasks = [(engine, path, options['writes'], worker) for worker in range(processes)]
+                # базы настраиваются только в дочерних процессах, текущие соединения не трогаем
+                with multiprocessing.get_context('fork').Pool(processes) as pool:
+                    pool.apply(prepare, (engine, path))
+                    started = time.monotonic()
+                    results = pool.map(_worker, tasks)
+                    elapsed = time.monotonic() - started
+            done = sum(row[0] for row in results)
+            failed = sum(row[1] for row in results)
+            self.stdout.write(f'{engine:>10}: {done / elapsed:8.0f} транзакций/с, '
+                              f'успешно {done}, ошибок блокировки {failed}, {elapsed:.1f} с')
@@ -0,0 +1,60 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts import benchmark, seed
+from yatube.sandbox import temporary_storage
+
+
+class Command(BaseCommand):
+    help = 'Заполняет тестовую базу и измеряет задержки и число запросов представлений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--requests', type=int, default=100, help='Запросов на каждое представление')
+        parser.add_argument('--views', nargs='+', choices=benchmark.VIEWS, default=benchmark.VIEWS)
+        parser.add_argument('--cold', action='store_true', help='Очищать кеш перед каждым запросом')
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        parser.add_argument('--baseline', help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимый рост p95, доля')
+
+    def handle(self, *args, **options):
+        scale = {name: options[name] for name in ('users', 'groups', 'posts', 'follows', 'comments')}
+
+        # замеры идут на отдельной тестовой базе и временном кеше, рабочие не затрагиваются:
+        # benchmark.run очищает кеш перед каждым представлением
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with temporary_storage():
+                started = time.monotonic()
+                seeded = seed.seed(**scale)
+                self.stdout.write(f'Данные созданы за {time.monotonic() - started:.1f} с: {scale}')
+
+                results = benchmark.run(seeded, options['requests'], options['views'], options['cold'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for view, row in results.items():
+            self.stdout.write(f'{view:>14}: p50 {row["p50_ms"]:7.1f} мс  p95 {row["p95_ms"]:7.1f} мс  '
+                              f'p99 {row["p99_ms"]:7.1f} мс  запросов {row["queries_p50"]}/{row["queries_max"]}')
+
+        report = {'created': timezone.now().isoformat(), 'scale': scale, 'views': results}
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = benchmark.compare(results, baseline['views'], options['tolerance'])
+            if regressions:
+                raise CommandError('Регрессии производительности:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
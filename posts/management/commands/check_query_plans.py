@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import query_plan, seed
+from yatube.sandbox import temporary_storage
+
+
+class Command(BaseCommand):
+    help = 'Проверяет планы SQL-запросов всех адресов posts на полный просмотр таблиц и сортировку без индекса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов поддерживается только для SQLite')
+        scale = {name: options[name] for name in ('users', 'groups', 'posts', 'follows', 'comments')}
+
+        # запросы выполняются на отдельной тестовой базе и временном кеше, рабочие не затрагиваются:
+        # query_plan.check очищает кеш перед каждым запросом
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with temporary_storage():
+                # планы зависят от статистики, поэтому собираем её как на рабочей базе
+                seeded = seed.seed(**scale)
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                found = query_plan.check(seeded)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for problem in found:
+            self.stdout.write(f'{problem["view"]}: {problem["method"]} {problem["url"]}')
+            self.stdout.write(f'    {problem["sql"]}')
+            for detail in problem['plan']:
+                self.stdout.write(f'    | {detail}')
+        if found:
+            raise CommandError(f'Запросов с полным просмотром или сортировкой без индекса: {len(found)}')
+        self.stdout.write(self.style.SUCCESS('Все запросы используют индексы'))
@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты с комментариями в NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='Файл для выгрузки, по умолчанию stdout')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--author')
+        parser.add_argument('--group')
+        parser.add_argument('--since')
+        parser.add_argument('--until')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            posts = export.filter_posts(options['author'], options['group'], options['since'], options['until'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        chunks = export.ndjson(export.records(posts, options['chunk_size']))
+        if options['gzip']:
+            chunks = export.gzipped(chunks)
+
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+        else:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
@@ -0,0 +1,54 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создает миниатюры для всех картинок постов в несколько процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--chunk-size', type=int, default=16)
+        parser.add_argument('--report-every', type=int, default=100)
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').exclude(image__isnull=True).order_by('pk')
+        total = images.count()
+        names = list(images.values_list('image', flat=True))
+        workers = options['workers']
+
+        if workers > 1:
+            # дочерние процессы открывают свои соединения с базой
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+            results = executor.map(thumbnails.generate_name, names, chunksize=options['chunk_size'])
+        else:
+            executor = None
+            results = map(thumbnails.generate_name, names)
+
+        started = time.monotonic()
+        done = errors = 0
+        try:
+            for error in results:
+                done += 1
+                if error:
+                    errors += 1
+                    self.stderr.write(error)
+                if done % options['report_every'] == 0 or done == total:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(f'{done}/{total} ({done / elapsed:.1f} изображений/с)')
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done} за {elapsed:.1f} с, {rate:.1f} изображений/с, ошибок: {errors}'))
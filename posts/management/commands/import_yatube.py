@@ -0,0 +1,241 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import bulk
+from posts.models import User, Group, Post, Comment, Follow
+
+
+def read_rows(path, skip):
+    """
+    Построчно читает JSONL или CSV (по расширению файла).
+    Строки, которые не разбираются в объект, передаются в skip.
+    """
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(f)
+        else:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    skip(line.strip(), f'неверный JSON в строке {number}: {e}')
+                    continue
+                if not isinstance(row, dict):
+                    skip(row, f'ожидался объект в строке {number}')
+                    continue
+                yield row
+
+
+def required(row, name):
+    # в CSV отсутствующий столбец читается как None
+    value = row.get(name)
+    if value is None or value == '':
+        raise KeyError(name)
+    return value
+
+
+def optional_id(row):
+    value = row.get('id')
+    return int(value) if value not in (None, '') else None
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'Неверная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+class Command(BaseCommand):
+    help = 'Загружает пользователей, группы, посты, комментарии и подписки из JSONL/CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users')
+        parser.add_argument('--groups')
+        parser.add_argument('--posts')
+        parser.add_argument('--comments')
+        parser.add_argument('--follows')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help='Не пересобирать ленты, счетчики и поисковый индекс')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        steps = [
+            ('users', User, self.import_users),
+            ('groups', Group, self.import_groups),
+            ('posts', Post, self.import_posts),
+            ('comments', Comment, self.import_comments),
+            ('follows', Follow, self.import_follows),
+        ]
+        if not any(options[name] for name, _, _ in steps):
+            raise CommandError('Укажите хотя бы один файл: --users, --groups, --posts, --comments или --follows')
+
+        self.usernames = None
+        for name, model, step in steps:
+            if options[name]:
+                started = time.monotonic()
+                created, skipped = self.load(step(read_rows(options[name], self.skip)), model)
+                elapsed = time.monotonic() - started
+                rate = created / elapsed if elapsed else 0
+                self.stdout.write(f'{name}: {created} строк за {elapsed:.1f} с ({rate:.0f} строк/с), '
+                                  f'пропущено: {skipped}')
+
+        if not options['skip_rebuild']:
+            result = bulk.rebuild_derived()
+            self.stdout.write(f'Ленты: {result["timeline"]}, исправлено счетчиков: {result["stats"]}, '
+                              f'в поисковом индексе: {result["search"]}')
+        self.stdout.write(self.style.SUCCESS('Импорт завершен'))
+
+    def load(self, objects, model):
+        """
+        Вставляет объекты пачками, каждая пачка в своей транзакции.
+        """
+        self.skipped = 0
+        created = 0
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                return created, self.skipped
+            with transaction.atomic():
+                if model is Post:
+                    with bulk.preserve_dates(Post, 'pub_date', 'modified'):
+                        model.objects.bulk_create(batch)
+                elif model is Comment:
+                    with bulk.preserve_dates(Comment, 'created'):
+                        model.objects.bulk_create(batch)
+                else:
+                    model.objects.bulk_create(batch)
+            created += len(batch)
+
+    def user_ids(self):
+        if self.usernames is None:
+            self.usernames = dict(User.objects.values_list('username', 'id'))
+        return self.usernames
+
+    def skip(self, row, reason):
+        self.skipped += 1
+        self.stderr.write(f'Пропущено ({reason}): {row}')
+
+    def import_users(self, rows):
+        existing = set(self.user_ids())
+        unusable = make_password(None)
+        for row in rows:
+            try:
+                username = required(row, 'username')
+                date_joined = parse_date(row.get('date_joined'))
+            except (KeyError, TypeError, ValueError) as e:
+                self.skip(row, f'неверные данные: {e}')
+                continue
+            if username in existing:
+                self.skipped += 1
+                continue
+            existing.add(username)
+            yield User(
+                username=username,
+                email=row.get('email') or '',
+                first_name=row.get('first_name') or '',
+                last_name=row.get('last_name') or '',
+                password=row.get('password') or unusable,
+                date_joined=date_joined,
+            )
+        # id новых пользователей bulk_create в SQLite не возвращает
+        self.usernames = None
+
+    def import_groups(self, rows):
+        existing = set(Group.objects.values_list('slug', flat=True))
+        for row in rows:
+            try:
+                slug, title = required(row, 'slug'), required(row, 'title')
+            except KeyError as e:
+                self.skip(row, f'неверные данные: {e}')
+                continue
+            if slug in existing:
+                self.skipped += 1
+                continue
+            existing.add(slug)
+            yield Group(slug=slug, title=title, description=row.get('description') or '')
+
+    def import_posts(self, rows):
+        users = self.user_ids()
+        groups = dict(Group.objects.values_list('slug', 'id'))
+        for row in rows:
+            try:
+                author, text = required(row, 'author'), required(row, 'text')
+                pub_date = parse_date(row.get('pub_date'))
+                post_id = optional_id(row)
+            except (KeyError, TypeError, ValueError) as e:
+                self.skip(row, f'неверные данные: {e}')
+                continue
+            author_id = users.get(author)
+            group_id = groups.get(row['group']) if row.get('group') else None
+            if author_id is None or (row.get('group') and group_id is None):
+                self.skip(row, 'неизвестный автор или группа')
+                continue
+            post = Post(
+                id=post_id,
+                text=text,
+                author_id=author_id,
+                group_id=group_id,
+                image=row.get('image') or None,
+                pub_date=pub_date,
+                modified=pub_date,
+            )
+            # bulk_create не вызывает save
+            post.render_text()
+            yield post
+
+    def import_comments(self, rows):
+        users = self.user_ids()
+        posts = set(Post.objects.values_list('id', flat=True))
+        for row in rows:
+            try:
+                author, text = required(row, 'author'), required(row, 'text')
+                created = parse_date(row.get('created'))
+                comment_id = optional_id(row)
+            except (KeyError, TypeError, ValueError) as e:
+                self.skip(row, f'неверные данные: {e}')
+                continue
+            author_id = users.get(author)
+            try:
+                post_id = int(row.get('post'))
+            except (TypeError, ValueError):
+                post_id = None
+            if author_id is None or post_id not in posts:
+                self.skip(row, 'неизвестный автор или пост')
+                continue
+            yield Comment(
+                id=comment_id,
+                post_id=post_id,
+                author_id=author_id,
+                text=text,
+                created=created,
+            )
+
+    def import_follows(self, rows):
+        users = self.user_ids()
+        existing = set(Follow.objects.values_list('user_id', 'author_id'))
+        for row in rows:
+            pair = users.get(row.get('user')), users.get(row.get('author'))
+            if None in pair:
+                self.skip(row, 'неизвестный пользователь')
+                continue
+            if pair[0] == pair[1] or pair in existing:
+                self.skipped += 1
+                continue
+            existing.add(pair)
+            yield Follow(user_id=pair[0], author_id=pair[1])
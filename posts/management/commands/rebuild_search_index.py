@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов'
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('Полнотекстовый индекс поддерживается только для SQLite')
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано постов: {count}'))
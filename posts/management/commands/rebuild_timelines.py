@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из таблиц Follow и Post'
+
+    def handle(self, *args, **options):
+        count = timeline.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Записей в лентах: {count}'))
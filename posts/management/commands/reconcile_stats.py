@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов, подписок и комментариев пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = stats.reconcile(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Исправлено строк: {fixed}'))
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0009_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.IntegerField(default=0)),
+                ('followers_count', models.IntegerField(default=0)),
+                ('following_count', models.IntegerField(default=0)),
+                ('comments_count', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
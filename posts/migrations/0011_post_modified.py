@@ -0,0 +1,20 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:31
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_userstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='date modified'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:40
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+BATCH_SIZE = 500
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    duplicates = (Follow.objects.values('user', 'author').order_by()
+                  .annotate(count=Count('id'), keep=Min('id')).filter(count__gt=1))
+    affected = set()
+    while True:
+        # оставляем самую раннюю подписку из каждой пары и удаляем остальные
+        batch = list(duplicates[:BATCH_SIZE])
+        if not batch:
+            break
+        for row in batch:
+            Follow.objects.filter(user=row['user'], author=row['author']).exclude(id=row['keep']).delete()
+            affected.update((row['user'], row['author']))
+
+    for user_id in affected:
+        UserStats.objects.filter(user_id=user_id).update(
+            followers_count=Follow.objects.filter(author_id=user_id).count(),
+            following_count=Follow.objects.filter(user_id=user_id).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created'], name='posts_comme_post_id_581ffd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='posts_follo_author__a4218d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date'], name='posts_post_group_i_1fdac4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date'], name='posts_post_author__7827da_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
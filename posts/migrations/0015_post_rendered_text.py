@@ -0,0 +1,48 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:09
+
+from django.db import migrations, models
+
+from posts import text as post_text
+
+BATCH_SIZE = 500
+
+
+def render_posts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    last_id = 0
+    while True:
+        batch = list(Post.objects.filter(id__gt=last_id).order_by('id').only('id', 'text')[:BATCH_SIZE])
+        if not batch:
+            break
+        for post in batch:
+            for name, value in post_text.render(post.text).items():
+                setattr(post, name, value)
+        # bulk_update не трогает modified, поэтому ETag и Last-Modified постов не меняются
+        Post.objects.bulk_update(batch, ['text_html', 'excerpt_html', 'truncated'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_comment_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='truncated',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(render_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_rendered_text'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_post_group_i_1fdac4_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_post_author__7827da_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', 'modified'], name='posts_post_group_i_1484db_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', 'modified'], name='posts_post_author__b418a9_idx'),
+        ),
+    ]
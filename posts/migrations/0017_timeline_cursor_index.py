@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_covering_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='timelineentry',
+            name='posts_timel_user_id_b48120_idx',
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='posts_timel_user_id_98bb4a_idx'),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 
+from . import text as post_text
+
 User = get_user_model()
 
 
@@ -13,16 +17,58 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """
+        Подтягивает автора, группу и число комментариев одним запросом.
+        """
+        comments = Comment.objects.filter(post=OuterRef('pk')).order_by().values('post')
+        comment_count = Subquery(comments.annotate(count=Count('pk')).values('count'), output_field=models.IntegerField())
+        return self.select_related('author', 'group').annotate(comment_count=Coalesce(comment_count, 0))
+
+    def for_list(self):
+        """
+        То же для лент: полный текст не загружается, карточке хватает начала.
+        """
+        return self.for_feed().defer('text', 'text_html')
+
+
 class Post(models.Model):
     text = models.TextField(null=False, blank=False)
     pub_date = models.DateTimeField('date published', auto_now_add=True, db_index=True)
+    modified = models.DateTimeField('date modified', auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='post_author')
     group = models.ForeignKey(Group, on_delete=models.CASCADE, blank=True, null=True, related_name='post_group')
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # HTML текста и его начала, см. render_text
+    text_html = models.TextField(blank=True, editable=False)
+    excerpt_html = models.TextField(blank=True, editable=False)
+    truncated = models.BooleanField(default=False, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # modified в индексе: ETag группы и профиля считается по одному индексу, без чтения строк
+            models.Index(fields=['group', '-pub_date', 'modified']),
+            models.Index(fields=['author', '-pub_date', 'modified']),
+        ]
 
     def __str__(self):
         return self.text
 
+    def render_text(self):
+        for name, value in post_text.render(self.text).items():
+            setattr(self, name, value)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.render_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'text_html', 'excerpt_html', 'truncated'}
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post')
@@ -30,10 +76,50 @@ class Comment(models.Model):
     text = models.TextField(null=False, blank=False)
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # id в индексе нужен для порядка курсорной пагинации (-created, -id)
+            models.Index(fields=['post', '-created', '-id']),
+        ]
+
     def __str__(self):
         return self.text
 
 
 class Follow(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='follower')
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following')
\ No newline at end of file
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['author', 'user']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'], name='unique_follow'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # post в индексе — вторая часть ключа курсора ленты, см. timeline.FeedPaginator;
+            # порядок обоих столбцов совпадает с ORDER BY, иначе SQLite досортирует во временном B-дереве
+            models.Index(fields=['user', '-pub_date', '-post']),
+            models.Index(fields=['user', 'author']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='unique_timeline_entry'),
+        ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    posts_count = models.IntegerField(default=0)
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
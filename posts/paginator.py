@@ -0,0 +1,142 @@
+import base64
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# наибольший id, который помещается в целочисленный столбец SQLite
+MAX_PK = 2 ** 63 - 1
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(Sequence):
+    """
+    Страница курсорной пагинации, совместимая с шаблонами Page.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage of %d items>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Пагинация по ключу (field, id) без COUNT(*) и OFFSET.
+
+    Курсор — непрозрачная строка с направлением и ключом граничной записи,
+    поэтому любая страница стоит одного запроса с LIMIT по индексу.
+    Вторая часть ключа задаётся key; resolve превращает строки страницы
+    в выводимые объекты, если пагинация идёт по вспомогательной таблице.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, field='pub_date', key='pk'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.field = field
+        self.key = key
+
+    def encode_cursor(self, obj, direction='next'):
+        value = getattr(obj, self.field).isoformat()
+        raw = f'{direction}|{value}|{getattr(obj, self.key)}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, value, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (ValueError, TypeError, UnicodeDecodeError):
+            raise InvalidCursor(cursor)
+        if direction not in ('next', 'prev') or value is None or timezone.is_naive(value):
+            raise InvalidCursor(cursor)
+        if not 0 < pk <= MAX_PK:
+            raise InvalidCursor(cursor)
+        return direction, value, pk
+
+    def resolve(self, rows):
+        return rows
+
+    def page(self, cursor=None):
+        field, key = self.field, self.key
+        if cursor is None:
+            direction, value, pk = 'next', None, None
+        else:
+            direction, value, pk = self.decode_cursor(cursor)
+
+        if direction == 'next':
+            queryset = self.object_list.order_by(f'-{field}', f'-{key}')
+            if value is not None:
+                queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, f'{key}__lt': pk}))
+        else:
+            queryset = self.object_list.order_by(field, key)
+            queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, f'{key}__gt': pk}))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == 'next':
+            has_next, has_previous = has_more, cursor is not None
+        else:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+
+        next_cursor = self.encode_cursor(rows[-1], 'next') if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], 'prev') if rows and has_previous else None
+        return CursorPage(self.resolve(rows), self, next_cursor, previous_cursor)
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
+
+
+def paginate(request, object_list, per_page=10, count_list=None, cursor_paginator=None):
+    """
+    Возвращает пару (paginator, page) для ленты постов.
+
+    Курсорная пагинация включается настройкой POSTS_CURSOR_PAGINATION
+    или параметром ?cursor= в запросе, иначе используется обычный Paginator.
+    Если передан count_list, число записей считается по нему: аннотации
+    ленты превращают COUNT(*) в полный просмотр таблицы с GROUP BY.
+    cursor_paginator заменяет CursorPaginator по object_list в курсорном режиме.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor is not None or getattr(settings, 'POSTS_CURSOR_PAGINATION', False):
+        paginator = cursor_paginator or CursorPaginator(object_list, per_page)
+        return paginator, paginator.get_page(cursor)
+
+    paginator = Paginator(object_list, per_page)
+    if count_list is not None:
+        # count — cached_property, заранее заполняем его кеш
+        paginator.count = count_list.count()
+    return paginator, paginator.get_page(request.GET.get('page'))
@@ -0,0 +1,94 @@
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+TABLE = 'posts_post_fts'
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """
+    Превращает ввод пользователя в безопасный запрос FTS5:
+    каждое слово ищется как префикс, все слова обязательны.
+    """
+    return ' '.join('"%s"*' % word.replace('"', '""') for word in query.split())
+
+
+def index_post(post):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(f'INSERT INTO {TABLE}(rowid, text) VALUES (%s, %s)', [post.pk, post.text])
+
+
+def remove_post(post_id):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(f'INSERT INTO {TABLE}(rowid, text) SELECT id, text FROM posts_post')
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def filter_posts(queryset, query):
+    """
+    Оставляет в queryset только посты, подходящие под запрос.
+    """
+    if not available():
+        return queryset.filter(text__icontains=query)
+    match = RawSQL(f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [match_expression(query)])
+    return queryset.filter(pk__in=match)
+
+
+class SearchResults:
+    """
+    Результаты поиска по релевантности, совместимые с Paginator:
+    count() и срезы выполняются по индексу FTS5.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.match = match_expression(query)
+
+    def count(self):
+        if not self.match:
+            return 0
+        if not available():
+            return filter_posts(Post.objects.all(), self.query).count()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {TABLE} WHERE {TABLE} MATCH %s', [self.match])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not self.match:
+            return []
+        offset = key.start or 0
+        limit = key.stop - offset
+        if not available():
+            posts = filter_posts(Post.objects.for_feed(), self.query).order_by('-pub_date')
+            return list(posts[offset:key.stop])
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s ORDER BY rank LIMIT %s OFFSET %s',
+                [self.match, limit, offset])
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
@@ -0,0 +1,76 @@
+import datetime as dt
+import random
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import bulk
+from .models import User, Group, Post, Comment, Follow
+
+
+def _insert(model, objects, batch_size):
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def seed(users=100, groups=10, posts=1000, follows=500, comments=1000, batch_size=10000, random_seed=0):
+    """
+    Заполняет базу синтетическими данными заданного масштаба.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    password = make_password(None)
+    prefix = f'seed{_next_id(User)}'
+
+    _insert(User, (User(username=f'{prefix}_user_{i}', password=password) for i in range(users)), batch_size)
+    user_ids = list(User.objects.filter(username__startswith=f'{prefix}_').order_by('pk').values_list('pk', flat=True))
+
+    _insert(Group, (Group(title=f'Группа {i}', slug=f'{prefix}-group-{i}', description='Описание')
+                    for i in range(groups)), batch_size)
+    group_ids = list(Group.objects.filter(slug__startswith=f'{prefix}-').values_list('pk', flat=True))
+
+    first_post = _next_id(Post)
+
+    def make_posts():
+        for i in range(posts):
+            pub_date = now - dt.timedelta(seconds=rng.randrange(365 * 24 * 3600))
+            post = Post(id=first_post + i, text=f'Тестовый пост {i} ' + 'текст ' * rng.randrange(1, 50),
+                        author_id=rng.choice(user_ids), group_id=rng.choice(group_ids + [None]),
+                        pub_date=pub_date, modified=pub_date)
+            # bulk_create не вызывает save
+            post.render_text()
+            yield post
+
+    def make_comments():
+        for i in range(comments):
+            yield Comment(post_id=first_post + rng.randrange(posts), author_id=rng.choice(user_ids),
+                          text=f'Комментарий {i}', created=now - dt.timedelta(seconds=rng.randrange(3600)))
+
+    def make_follows():
+        # каждый подписан на следующих по кругу авторов, поэтому пары не повторяются
+        per_user = min(follows // max(users, 1), users - 1)
+        for index, user_id in enumerate(user_ids):
+            for step in range(1, per_user + 1):
+                yield Follow(user_id=user_id, author_id=user_ids[(index + step) % users])
+
+    with bulk.preserve_dates(Post, 'pub_date', 'modified'):
+        _insert(Post, make_posts(), batch_size)
+    if posts:
+        with bulk.preserve_dates(Comment, 'created'):
+            _insert(Comment, make_comments(), batch_size)
+    _insert(Follow, make_follows(), batch_size)
+
+    bulk.rebuild_derived()
+    return {'users': user_ids, 'groups': group_ids, 'posts': list(range(first_post, first_post + posts))}
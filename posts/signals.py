@@ -0,0 +1,91 @@
+from django.db.models import Q
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import search, stats, timeline
+from .cache import bump_generation
+from .models import User, Post, Group, Follow, Comment
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    search.index_post(instance)
+    if created:
+        timeline.fan_out(instance)
+        stats.bump(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+    stats.bump(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+        stats.bump(instance.user_id, 'following_count', 1)
+        stats.bump(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+    stats.bump(instance.user_id, 'following_count', -1)
+    stats.bump(instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(instance.author_id, 'comments_count', 1)
+    touch_post(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, 'comments_count', -1)
+    touch_post(instance.post_id)
+
+
+def touch_post(post_id):
+    # время изменения поста учитывает и комментарии: по нему строится ETag
+    Post.objects.filter(pk=post_id).update(modified=timezone.now())
+
+
+# поля пользователя, которые выводятся на карточках постов и в комментариях
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    # вход сохраняет только last_login, такие сохранения не сравниваем
+    instance._renamed = False
+    if instance.pk is None or (update_fields is not None and not set(NAME_FIELDS) & set(update_fields)):
+        return
+    stored = User.objects.filter(pk=instance.pk).values_list(*NAME_FIELDS).first()
+    instance._renamed = stored is not None and stored != tuple(getattr(instance, name) for name in NAME_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    if instance._renamed:
+        # имя автора есть на страницах его постов и постов, где он оставил комментарии
+        commented = Comment.objects.filter(author=instance.pk).values('post_id')
+        Post.objects.filter(Q(author=instance.pk) | Q(pk__in=commented)).update(modified=timezone.now())
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=User)
+def content_changed(sender, instance, **kwargs):
+    # из данных пользователя в кешированных страницах есть только имя
+    if sender is User and not instance._renamed:
+        return
+    bump_generation()
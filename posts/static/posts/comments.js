@@ -0,0 +1,9 @@
+// «Показать ещё»: подставляем следующую порцию комментариев вместо кнопки
+$(document).on('click', '.load-more-comments', function (event) {
+    event.preventDefault();
+    var link = $(this);
+    link.addClass('disabled');
+    $.get(link.attr('href'), function (html) {
+        link.replaceWith(html);
+    });
+});
@@ -0,0 +1,68 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import User, Post, Comment, Follow, UserStats
+
+COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+    'comments_count': (Comment, 'author'),
+}
+
+
+def _count(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+    return Coalesce(Subquery(rows.annotate(count=Count('pk')).values('count'), output_field=IntegerField()), 0)
+
+
+def _with_counts(users):
+    return users.annotate(**{name: _count(model, field) for name, (model, field) in COUNTERS.items()})
+
+
+def recount(user_id):
+    counts = _with_counts(User.objects.filter(pk=user_id)).values(*COUNTERS).first()
+    if counts is None:
+        return None
+    stats, _ = UserStats.objects.update_or_create(user_id=user_id, defaults=counts)
+    return stats
+
+
+def bump(user_id, counter, delta):
+    """
+    Атомарно меняет счетчик пользователя на delta.
+    """
+    updated = UserStats.objects.filter(user_id=user_id).update(**{counter: F(counter) + delta})
+    if not updated and delta > 0:
+        # строки еще нет: считаем с нуля, новая запись уже учтена
+        recount(user_id)
+
+
+def get_stats(user):
+    try:
+        return UserStats.objects.get(user_id=user.pk)
+    except UserStats.DoesNotExist:
+        return recount(user.pk)
+
+
+def reconcile(chunk_size=1000):
+    """
+    Сверяет счетчики с реальными данными и исправляет расхождения.
+    Возвращает количество исправленных строк.
+    """
+    fixed = 0
+    last_pk = 0
+    while True:
+        users = _with_counts(User.objects.filter(pk__gt=last_pk).order_by('pk')).values('pk', *COUNTERS)
+        chunk = list(users[:chunk_size])
+        if not chunk:
+            return fixed
+        last_pk = chunk[-1]['pk']
+
+        stored = UserStats.objects.filter(user_id__in=[counts['pk'] for counts in chunk])
+        stored = {row.pop('user_id'): row for row in stored.values('user_id', *COUNTERS)}
+        for counts in chunk:
+            user_id = counts.pop('pk')
+            if stored.get(user_id) != counts:
+                UserStats.objects.update_or_create(user_id=user_id, defaults=counts)
+                fixed += 1
@@ -0,0 +1,16 @@
+from django import template
+
+from .. import holes
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, *args):
+    """
+    Персональная часть страницы: рисуется сразу или, для страниц
+    из общего кеша, заменяется меткой и подставляется при ответе.
+    """
+    if holes.is_punching(context):
+        return holes.marker(name, *args)
+    return holes.render(name, context.get('request'), *args)
@@ -0,0 +1,56 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from yatube.metrics import record_cache
+from .. import holes
+
+register = template.Library()
+
+
+def card_key(post, full=False):
+    comment_count = getattr(post, 'comment_count', '')
+    # автор и группа приходят из select_related и меняются без сохранения поста
+    group = (post.group.slug, post.group.title) if post.group_id else None
+    related = hashlib.md5(repr((post.author.username, group)).encode()).hexdigest()
+    return (f'post_card:{post.pk}:{post.modified.timestamp()}:{comment_count}:{related}:'
+            f'{"full" if full else "excerpt"}')
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, full=False):
+    """
+    Выводит карточки постов, забирая готовые из кеша одним get_many.
+    В лентах карточка показывает начало текста, с full=True — весь текст.
+
+    Ключ включает время изменения поста, число комментариев, имя автора
+    и группу, поэтому правка поста, новый комментарий или переименование
+    автора или группы дают новый ключ. Карточки общие
+    для всех пользователей: кнопка правки — метка, её заполняет holes.fill.
+    """
+    posts = list(posts)
+    keys = [card_key(post, full) for post in posts]
+    cards = cache.get_many(keys)
+
+    missing = {
+        key: render_to_string('post_item.html', {'post': post, 'full': full, 'punch_holes': True})
+        for key, post in zip(keys, posts) if key not in cards
+    }
+    record_cache('post_card', hits=len(cards), misses=len(missing))
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+
+    html = ''.join(cards[key] for key in keys)
+    if not holes.is_punching(context):
+        html = holes.fill(html, context.get('request'))
+    return mark_safe(html)
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    return post_cards(context, [post], full=True)
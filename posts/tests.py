@@ -1,8 +1,34 @@
-from django.test import TestCase, Client
+import base64
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.core.cache import cache
+from django.contrib.sessions.models import Session
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
 
-from .models import Post, Group, Follow, Comment
+from .models import Post, Group, Follow, Comment, TimelineEntry, UserStats
+from .cache import bump_generation, should_refresh, single_flight_cache_page
+from . import benchmark, holes, query_plan, seed, thumbnails, timeline
+from .paginator import CursorPaginator, InvalidCursor
+from .templatetags import post_cache
+from jobs import queue
+from jobs.models import Job
+from yatube import metrics, routers
+from yatube.routers import ReplicaRouter
+from yatube.sqlite_cache import SQLiteCache
 
 
 class TestYatube(TestCase):
@@ -114,20 +140,22 @@ class TestYatube(TestCase):
 
     def test_cache(self):
         self.client.login(username='dmitry', password='12345')
-        response = self.client.get('')
+        self.client.get('')
 
-        self.post = Post.objects.create(
-            text='Hello Cache',
-            author=self.user)
+        # изменение в обход сигналов не видно: страница берется из кеша
+        Post.objects.filter(pk=self.post.pk).update(text='Hello Cache')
+        response = self.client.get('')
+        self.assertNotContains(response, 'Hello Cache')
 
-        # проверяем кешируется ли страница
+        # новый пост меняет поколение кеша и сразу появляется на стартовой
+        post = Post.objects.create(text='New Cache', author=self.user)
         response = self.client.get('')
-        self.assertNotContains(response, self.post.text)
-        cache.clear()
+        self.assertContains(response, post.text)
 
-        # проверяем, что после очистки кэша пост появился на стартовой
+        # удаление тоже сбрасывает кеш
+        post.delete()
         response = self.client.get('')
-        self.assertContains(response, self.post.text)
+        self.assertNotContains(response, post.text)
 
     def test_follow_auth(self):
         user_1 = User.objects.create_user(username='user_1', email='connor.s@skynet.com', password='12345')
@@ -176,3 +204,960 @@ class TestYatube(TestCase):
 
         # проверяем редирект на страницу авторизации, ели юзер не авторизован
         self.assertRedirects(response, response.redirect_chain[0][0])
+
+
+class TestSingleFlightCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def view(self, request):
+        with self.lock:
+            self.calls += 1
+            number = self.calls
+        time.sleep(0.2)
+        return HttpResponse(f'Страница {number}')
+
+    def get_concurrently(self, cached_view, count=8):
+        barrier = threading.Barrier(count)
+        responses = []
+
+        def worker():
+            request = RequestFactory().get('/stampede/')
+            barrier.wait()
+            responses.append(cached_view(request).content.decode())
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return set(responses)
+
+    def test_one_recompute_per_expiry(self):
+        cached_view = single_flight_cache_page(1, stale_timeout=60, beta=0)(self.view)
+
+        # пустой кеш: страницу считает один запрос, остальные ждут его
+        self.assertEqual(self.get_concurrently(cached_view), {'Страница 1'})
+        self.assertEqual(self.calls, 1)
+
+        # срок истёк: пересчитывает один запрос, остальные получают старую страницу
+        time.sleep(1.1)
+        self.assertLessEqual(self.get_concurrently(cached_view), {'Страница 1', 'Страница 2'})
+        self.assertEqual(self.calls, 2)
+
+        # то же при смене поколения постов
+        bump_generation()
+        self.get_concurrently(cached_view)
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(self.get_concurrently(cached_view), {'Страница 3'})
+
+    def test_early_expiry(self):
+        entry = {'expires': 100.0, 'delta': 1.0}
+        with mock.patch('posts.cache.random.random', return_value=0.01):
+            self.assertTrue(should_refresh(entry, 96.0))
+            self.assertFalse(should_refresh(entry, 90.0))
+            self.assertFalse(should_refresh(entry, 99.0, beta=0))
+
+
+class TestHolePunching(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        self.other = User.objects.create_user(username='sarah', password='12345')
+        Post.objects.create(text='Пост dmitry', author=self.user)
+        Post.objects.create(text='Пост sarah', author=self.other)
+        cache.clear()
+
+    def test_users_share_cached_index(self):
+        response = self.client.get('/')
+        self.assertContains(response, 'Войти')
+        self.assertNotContains(response, 'Редактировать')
+        self.assertNotContains(response, '<!--hole:')
+
+        # страница в кеше общая и без персональных частей
+        # вход сохраняет last_login и сбрасывает пользователя в кеше, первый запрос загружает его заново
+        self.client.force_login(self.user)
+        self.client.get('/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+        self.assertContains(response, 'Пользователь: dmitry')
+        self.assertContains(response, 'Избранные авторы')
+        # браузер перепроверяет страницу при каждом заходе
+        self.assertEqual(set(response['Cache-Control'].split(', ')), {'private', 'no-cache'})
+        self.assertFalse(response.has_header('Expires'))
+        own_edit = f'/dmitry/{Post.objects.get(author=self.user).pk}/edit/'
+        self.assertContains(response, 'Редактировать', count=1)
+        self.assertContains(response, own_edit)
+
+        self.client.force_login(self.other)
+        response = self.client.get('/')
+        self.assertContains(response, 'Пользователь: sarah')
+        self.assertContains(response, f'/sarah/{Post.objects.get(author=self.other).pk}/edit/')
+        self.assertNotContains(response, own_edit)
+
+    def test_fill(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        html = holes.marker('edit', self.user.pk, 'dmitry', 5) + holes.marker('edit', self.other.pk, 'sarah', 6)
+        filled = holes.fill(html, request)
+        self.assertIn('/dmitry/5/edit/', filled)
+        self.assertNotIn('/sarah/6/edit/', filled)
+
+
+class TestCursorPaginator(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        for i in range(25):
+            Post.objects.create(text=f'Пост {i}', author=self.user)
+        self.expected = list(Post.objects.order_by('-pub_date', '-id').values_list('id', flat=True))
+        cache.clear()
+
+    def test_walk_forward_and_back(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        pages = [paginator.get_page(None)]
+        while pages[-1].has_next():
+            with self.assertNumQueries(1):
+                pages.append(paginator.get_page(pages[-1].next_cursor))
+
+        # проверяем, что обход вперед дает все посты по порядку без повторов
+        self.assertEqual([post.id for page in pages for post in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertFalse(pages[0].has_previous())
+
+        # возвращаемся назад на первую страницу
+        previous = paginator.get_page(pages[1].previous_cursor)
+        self.assertEqual([post.id for post in previous], self.expected[:10])
+        self.assertFalse(previous.has_previous())
+
+    def test_invalid_cursor(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.get_page('мусор')
+        self.assertEqual([post.id for post in page], self.expected[:10])
+
+        def encode(raw):
+            return base64.urlsafe_b64encode(raw.encode()).decode()
+
+        for raw in ('next|2020-01-01T00:00:00+00:00|99999999999999999999999',
+                    'next|2020-01-01T00:00:00+00:00|0',
+                    'next|2020-01-01T00:00:00|5'):
+            with self.assertRaises(InvalidCursor):
+                paginator.decode_cursor(encode(raw))
+        response = self.client.get(f'/{self.user.username}/',
+                                   {'cursor': encode('next|2020-01-01T00:00:00+00:00|99999999999999999999999')})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(POSTS_CURSOR_PAGINATION=True)
+    def test_views(self):
+        response = self.client.get('')
+        page = response.context['page']
+        self.assertTrue(response.context['paginator'].is_cursor)
+        self.assertContains(response, f'?cursor={page.next_cursor}')
+
+        response = self.client.get(f'/{self.user.username}/', {'cursor': page.next_cursor})
+        self.assertEqual([post.id for post in response.context['page']], self.expected[10:20])
+
+    def test_follow_feed(self):
+        reader = User.objects.create_user(username='sarah', password='12345')
+        Follow.objects.create(user=reader, author=self.user)
+        paginator = timeline.FeedPaginator(reader)
+        pages = [paginator.get_page(None)]
+        while pages[-1].has_next():
+            # страница записей ленты и посты к ней
+            with self.assertNumQueries(2):
+                pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([post.id for page in pages for post in page], self.expected)
+        previous = paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual([post.id for post in previous], self.expected[10:20])
+
+        # ключ курсора целиком читается из индекса ленты
+        with CaptureQueriesContext(connection) as queries:
+            paginator.get_page(pages[1].next_cursor)
+        entries = queries.captured_queries[0]['sql']
+        plan = query_plan.explain(entries, ())
+        self.assertEqual(query_plan.problems(entries, plan), [])
+        self.assertTrue(any('COVERING INDEX' in detail for detail in plan), plan)
+
+        self.client.force_login(reader)
+        response = self.client.get('/follow/', {'cursor': pages[1].next_cursor})
+        self.assertEqual([post.id for post in response.context['page']], self.expected[20:])
+
+
+class TestTimeline(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.reader = User.objects.create_user(username='reader', password='12345')
+        self.author = User.objects.create_user(username='author', password='12345')
+        self.old_post = Post.objects.create(text='Старый пост', author=self.author)
+        self.client.login(username='reader', password='12345')
+
+    def timeline(self):
+        return set(TimelineEntry.objects.filter(user=self.reader).values_list('post_id', flat=True))
+
+    def test_follow_and_unfollow(self):
+        # при подписке лента заполняется постами автора
+        self.client.get(f'/{self.author.username}/follow')
+        self.assertEqual(self.timeline(), {self.old_post.id})
+
+        # новый пост расходится по лентам подписчиков
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.timeline(), {self.old_post.id, post.id})
+
+        response = self.client.get('/follow/')
+        self.assertEqual([item.id for item in response.context['page']], [post.id, self.old_post.id])
+
+        # при отписке посты автора удаляются из ленты
+        self.client.get(f'/{self.author.username}/unfollow')
+        self.assertEqual(self.timeline(), set())
+
+    def test_rebuild_command(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline(), {self.old_post.id})
+
+    @override_settings(TIMELINE_BACKFILL=2)
+    def test_rebuild_keeps_latest_posts(self):
+        posts = [Post.objects.create(text=f'Пост {i}', author=self.author) for i in range(3)]
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+
+        # число запросов не зависит от числа подписок
+        with self.assertNumQueries(4):
+            self.assertEqual(timeline.rebuild(), 2)
+        self.assertEqual(self.timeline(), {posts[1].id, posts[2].id})
+
+
+class TestUserStats(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        self.author = User.objects.create_user(username='sarah', password='12345')
+
+    def counters(self, user):
+        return UserStats.objects.filter(user=user).values_list(
+            'posts_count', 'followers_count', 'following_count', 'comments_count').first()
+
+    def test_counters_follow_changes(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        Comment.objects.create(post=post, author=self.user, text='Коммент')
+        self.assertEqual(self.counters(self.author), (1, 1, 0, 0))
+        self.assertEqual(self.counters(self.user), (0, 0, 1, 1))
+
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        post.delete()
+        self.assertEqual(self.counters(self.author), (0, 0, 0, 0))
+        self.assertEqual(self.counters(self.user), (0, 0, 0, 0))
+
+    def test_repeated_follow_is_counted_once(self):
+        self.client.login(username='dmitry', password='12345')
+        self.client.get(f'/{self.author.username}/follow')
+        self.client.get(f'/{self.author.username}/follow')
+        self.assertEqual(Follow.objects.filter(user=self.user, author=self.author).count(), 1)
+        self.assertEqual(self.counters(self.author), (0, 1, 0, 0))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.author)
+
+    def test_profile_reads_counters(self):
+        Post.objects.create(text='Пост', author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+
+        response = self.client.get(f'/{self.author.username}/')
+        self.assertEqual(response.context['count_post'], 1)
+        self.assertEqual(response.context['following'], 1)
+        self.assertEqual(response.context['follow_count'], 0)
+
+    def test_reconcile_command(self):
+        Post.objects.create(text='Пост', author=self.author)
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+
+        out = StringIO()
+        call_command('reconcile_stats', stdout=out)
+        # у второго пользователя строки еще не было, она тоже создается
+        self.assertIn('Исправлено строк: 2', out.getvalue())
+        self.assertEqual(self.counters(self.author), (1, 0, 0, 0))
+
+
+class TestFeedQueries(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        self.group = Group.objects.create(title='test', slug='test')
+        for i in range(12):
+            author = User.objects.create_user(username=f'author_{i}', password='12345')
+            Follow.objects.create(user=self.user, author=author)
+            post = Post.objects.create(text=f'Пост {i}', author=author, group=self.group)
+            for j in range(i % 3):
+                Comment.objects.create(post=post, author=self.user, text=f'Коммент {j}')
+        cache.clear()
+
+    def test_comment_count(self):
+        post = Post.objects.for_feed().get(text='Пост 2')
+        self.assertEqual(post.comment_count, 2)
+        response = self.client.get('/')
+        self.assertContains(response, '2 комментариев')
+
+    def test_count_without_annotations(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/group/{self.group.slug}/')
+        self.assertEqual(response.context['paginator'].count, 12)
+        counts = [q['sql'] for q in queries.captured_queries if 'COUNT(*)' in q['sql']]
+        self.assertEqual(len(counts), 1)
+        self.assertNotIn('GROUP BY', counts[0])
+
+    def test_query_count(self):
+        # количество запросов не зависит от числа постов на странице
+        with self.assertNumQueries(2):
+            self.client.get('/')
+        # две дополнительные запроса считают валидаторы для условного GET
+        with self.assertNumQueries(5):
+            self.client.get(f'/group/{self.group.slug}/')
+        with self.assertNumQueries(6):
+            self.client.get('/author_1/')
+
+        # сессия и пользователь берутся из кеша
+        self.client.force_login(self.user)
+        self.client.get('/follow/')
+        with self.assertNumQueries(2):
+            self.client.get('/follow/')
+
+
+@override_settings(COMMENTS_PER_PAGE=20)
+class TestPostComments(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        self.post = Post.objects.create(text='Пост', author=self.user)
+        Comment.objects.bulk_create([Comment(post=self.post, author=self.user, text=f'Коммент {i}')
+                                     for i in range(45)])
+        cache.clear()
+
+    def test_first_chunk_has_fixed_cost(self):
+        url = f'/{self.user.username}/{self.post.id}/'
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['items']), 20)
+        self.assertIsNotNone(response.context['next_cursor'])
+
+        comments = Comment.objects.filter(post=self.post)
+        comments.filter(pk__in=list(comments.values_list('pk', flat=True)[:40])).delete()
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['items']), 5)
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_load_more(self):
+        response = self.client.get(f'/{self.user.username}/{self.post.id}/')
+        seen = [comment.pk for comment in response.context['items']]
+        next_cursor = response.context['next_cursor']
+        while next_cursor:
+            # проверка поста и порция комментариев
+            with self.assertNumQueries(2):
+                response = self.client.get(f'/{self.user.username}/{self.post.id}/comments/?cursor={next_cursor}')
+            seen += [comment.pk for comment in response.context['items']]
+            next_cursor = response.context['next_cursor']
+        self.assertNotContains(response, 'Показать ещё')
+        expected = Comment.objects.filter(post=self.post).order_by('-created', '-pk').values_list('pk', flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_missing_post(self):
+        other = User.objects.create_user(username='sarah', password='12345')
+        for url in (f'/{other.username}/{self.post.id}/comments/', f'/{self.user.username}/{self.post.id + 1}/comments/',
+                    f'/nobody/{self.post.id}/comments/'):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(POST_EXCERPT_LENGTH=50)
+class TestPostText(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        self.post = Post.objects.create(text='Начало <b>поста</b>\n' + 'слово ' * 50 + 'конец', author=self.user)
+        cache.clear()
+
+    def test_rendered_on_save(self):
+        self.assertTrue(self.post.truncated)
+        self.assertIn('&lt;b&gt;поста&lt;/b&gt;<br>', self.post.text_html)
+        self.assertNotIn('конец', self.post.excerpt_html)
+
+        self.post.text = 'Короткий\nпост'
+        self.post.save(update_fields=['text'])
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.text_html, self.post.excerpt_html, self.post.truncated),
+                         ('Короткий<br>пост', 'Короткий<br>пост', False))
+
+    def test_feed_shows_excerpt(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/')
+        self.assertFalse([query for query in queries if '"posts_post"."text"' in query['sql']])
+        self.assertContains(response, 'Начало &lt;b&gt;поста&lt;/b&gt;')
+        self.assertNotContains(response, 'конец')
+        self.assertContains(response, 'Читать далее')
+        self.assertContains(response, f'/dmitry/{self.post.pk}/')
+
+        response = self.client.get(f'/dmitry/{self.post.pk}/')
+        self.assertContains(response, 'конец')
+        self.assertNotContains(response, 'Читать далее')
+
+
+class TestPostCardCache(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        self.posts = [Post.objects.create(text=f'Пост {i}', author=self.user) for i in range(10)]
+        cache.clear()
+
+    def test_cards_are_cached(self):
+        self.client.get(f'/{self.user.username}/')
+
+        # изменение в обход save() не меняет ключ: карточка берется из кеша
+        post = self.posts[0]
+        Post.objects.filter(pk=post.pk).update(text='Изменено')
+        with mock.patch.object(post_cache, 'cache', mock.Mock(wraps=cache)) as mocked:
+            response = self.client.get(f'/{self.user.username}/')
+        self.assertNotContains(response, 'Изменено')
+        self.assertEqual(mocked.get_many.call_count, 1)
+        self.assertFalse(mocked.set_many.called)
+
+        # сохранение поста и новый комментарий дают новый ключ
+        post.refresh_from_db()
+        post.save()
+        Comment.objects.create(post=self.posts[1], author=self.user, text='Коммент')
+        response = self.client.get(f'/{self.user.username}/')
+        self.assertContains(response, 'Изменено')
+        self.assertContains(response, '1 комментариев')
+
+    def test_renamed_group_and_author(self):
+        group = Group.objects.create(title='Старое', slug='old')
+        Post.objects.filter(pk=self.posts[0].pk).update(group=group)
+        self.client.get('/group/old/')
+
+        # переименование не меняет время изменения поста, но меняет ключ карточки
+        group.title = 'Новое'
+        group.save()
+        self.assertContains(self.client.get('/group/old/'), '#Новое')
+
+        # страницы целиком тоже в кеше: смена имени автора сбрасывает и их
+        self.assertContains(self.client.get('/'), '@dmitry')
+        self.user.username = 'renamed'
+        self.user.save()
+        for url in ('/group/old/', '/'):
+            response = self.client.get(url)
+            self.assertContains(response, '@renamed')
+            self.assertNotContains(response, '@dmitry')
+
+    def test_edit_button_only_for_author(self):
+        self.client.get(f'/{self.user.username}/')
+        self.client.force_login(self.user)
+        response = self.client.get(f'/{self.user.username}/')
+        self.assertContains(response, 'Редактировать', count=10)
+
+
+class TestThumbnails(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        with open('test_files/california.jpg', 'rb') as img:
+            image = SimpleUploadedFile('california.jpg', img.read(), content_type='image/jpeg')
+        self.post = Post.objects.create(text='Hello image', author=self.user, image=image)
+
+    def test_generate_command(self):
+        out = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=out, stderr=StringIO())
+        self.assertIn('Готово: 1', out.getvalue())
+        self.assertIn('ошибок: 0', out.getvalue())
+
+        thumbnail = thumbnails.generate(self.post.image)
+        self.assertTrue(thumbnail.exists())
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+
+    def test_schedule_is_queued_once(self):
+        thumbnails.schedule(self.post)
+        thumbnails.schedule(self.post)
+        job = Job.objects.get()
+        self.assertEqual(job.path, 'posts.thumbnails.generate')
+        self.assertEqual(queue.run(queue.claim()), Job.DONE)
+
+
+class TestSearch(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        self.cat = Post.objects.create(text='Кот сидит на окне', author=self.user)
+        self.cats = Post.objects.create(text='Коты и кот спят, кот доволен', author=self.user)
+        self.dog = Post.objects.create(text='Собака гуляет', author=self.user)
+
+    def test_search_page(self):
+        response = self.client.get('/search/', {'q': 'кот'})
+        self.assertEqual(response.context['paginator'].count, 2)
+        # чаще встречающееся слово дает более высокий ранг
+        self.assertEqual([post.id for post in response.context['page']], [self.cats.id, self.cat.id])
+        self.assertNotContains(response, self.dog.text)
+
+    def test_index_follows_changes(self):
+        self.dog.text = 'Собака и кот'
+        self.dog.save()
+        self.cat.delete()
+
+        response = self.client.get('/search/api/', {'q': 'кот "собака'})
+        data = response.json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['id'], self.dog.id)
+
+    def test_rebuild_command(self):
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Проиндексировано постов: 3', out.getvalue())
+
+    def test_admin_search(self):
+        User.objects.create_superuser(username='admin', email='admin@example.com', password='12345')
+        self.client.login(username='admin', password='12345')
+        response = self.client.get('/admin/posts/post/', {'q': 'собака'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.dog])
+
+
+class TestConditionalGet(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        self.group = Group.objects.create(title='test', slug='test')
+        self.post = Post.objects.create(text='Пост', author=self.user, group=self.group)
+        self.urls = [f'/{self.user.username}/', f'/{self.user.username}/{self.post.id}/', f'/group/{self.group.slug}/']
+
+    def test_not_modified(self):
+        for url in self.urls:
+            etag = self.client.get(url)['ETag']
+            with self.assertTemplateNotUsed('base.html'):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+            # Last-Modified не учитывает подписки и вход, поэтому его нет вовсе
+            response = self.client.get(url)
+            self.assertFalse(response.has_header('Last-Modified'))
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+            self.assertEqual(response.status_code, 200)
+
+    def test_changes_invalidate_etag(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Comment.objects.create(post=self.post, author=self.user, text='Коммент')
+        for url, etag in zip(self.urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # подписка меняет счётчики профиля
+        other = User.objects.create_user(username='sarah', password='12345')
+        etag = self.client.get(self.urls[0])['ETag']
+        Follow.objects.create(user=other, author=self.user)
+        self.assertEqual(self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # страница зависит от пользователя, поэтому ETag тоже
+        etag = self.client.get(self.urls[0])['ETag']
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_renames_invalidate_etag(self):
+        other = User.objects.create_user(username='sarah', password='12345')
+        Comment.objects.create(post=self.post, author=other, text='Коммент')
+
+        # имя профиля выводится в заголовке и карточке пользователя
+        etags = [self.client.get(url)['ETag'] for url in self.urls[:2]]
+        self.user.first_name = 'Дмитрий'
+        self.user.save()
+        for url, etag in zip(self.urls[:2], etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # имя автора есть на карточках, имя комментатора — на странице поста
+        for user in (self.user, other):
+            etags = [self.client.get(url)['ETag'] for url in self.urls]
+            user.username += '_new'
+            user.save()
+            self.urls = [f'/{self.user.username}/', f'/{self.user.username}/{self.post.id}/',
+                         f'/group/{self.group.slug}/']
+            for url, etag in zip(self.urls, etags):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200, url)
+
+        # вход сохраняет только last_login и посты не трогает
+        modified = Post.objects.get(pk=self.post.pk).modified
+        self.client.login(username=self.user.username, password='12345')
+        self.assertEqual(Post.objects.get(pk=self.post.pk).modified, modified)
+
+
+class TestImport(TestCase):
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        User.objects.create_user(username='dmitry', password='12345')
+
+    def test_import(self):
+        users = self.write('users.csv', 'username,email\nsarah,s@example.com\ndmitry,d@example.com\n')
+        groups = self.write('groups.jsonl', json.dumps({'slug': 'cats', 'title': 'Коты'}) + '\n')
+        posts = self.write('posts.jsonl', '\n'.join(json.dumps(row) for row in [
+            {'id': 100, 'author': 'sarah', 'group': 'cats', 'text': 'Кот', 'pub_date': '2020-01-01T10:00:00Z'},
+            {'id': 101, 'author': 'dmitry', 'text': 'Собака', 'pub_date': '2020-01-02T10:00:00Z'},
+            {'id': 102, 'author': 'nobody', 'text': 'Потерянный'},
+        ]))
+        comments = self.write('comments.csv', 'post,author,text\n100,dmitry,Отличный кот\nсто,dmitry,Опечатка\n')
+        follows = self.write('follows.csv', 'user,author\ndmitry,sarah\ndmitry,sarah\nsarah,sarah\n')
+
+        out, err = StringIO(), StringIO()
+        call_command('import_yatube', users=users, groups=groups, posts=posts, comments=comments,
+                     follows=follows, batch_size=1, stdout=out, stderr=err)
+        self.assertIn('строк/с', out.getvalue())
+        self.assertIn("'post': 'сто'", err.getvalue())
+
+        self.assertEqual(User.objects.count(), 2)
+        post = Post.objects.get(pk=100)
+        self.assertEqual((post.author.username, post.group.slug), ('sarah', 'cats'))
+        self.assertEqual(post.pub_date.isoformat(), '2020-01-01T10:00:00+00:00')
+        self.assertFalse(Post.objects.filter(pk=102).exists())
+        self.assertEqual(Comment.objects.get().post_id, 100)
+        # дубликаты и подписка на себя пропускаются
+        self.assertEqual(Follow.objects.count(), 1)
+
+        # ленты, счетчики и поиск пересобраны после bulk_create
+        dmitry = User.objects.get(username='dmitry')
+        self.assertEqual(list(TimelineEntry.objects.filter(user=dmitry).values_list('post_id', flat=True)), [100])
+        self.assertEqual(UserStats.objects.get(user=dmitry).comments_count, 1)
+        response = self.client.get('/search/', {'q': 'кот'})
+        self.assertEqual([item.id for item in response.context['page']], [100])
+
+    def test_bad_rows_are_skipped(self):
+        posts = self.write('posts.jsonl', '\n'.join([
+            json.dumps({'id': 100, 'author': 'dmitry', 'text': 'Кот', 'pub_date': '2020-01-01T10:00:00Z'}),
+            json.dumps({'id': 101, 'author': 'dmitry', 'text': 'Собака', 'pub_date': 'garbage'}),
+            json.dumps({'id': 102, 'author': 'dmitry'}),
+            json.dumps({'id': 'сто три', 'author': 'dmitry', 'text': 'Хомяк'}),
+            '{"id": 104,',
+            '[104]',
+        ]))
+        comments = self.write('comments.csv', 'post,author,text,created\n100,dmitry,Отличный кот,вчера\n100,dmitry\n')
+        follows = self.write('follows.csv', 'user\ndmitry\n')
+
+        err = StringIO()
+        call_command('import_yatube', posts=posts, comments=comments, follows=follows,
+                     stdout=StringIO(), stderr=err)
+        self.assertEqual(err.getvalue().count('Пропущено'), 8)
+        self.assertEqual(list(Post.objects.values_list('id', flat=True)), [100])
+        self.assertFalse(Comment.objects.exists())
+
+        # после пропущенных строк производные данные всё равно пересобраны
+        dmitry = User.objects.get(username='dmitry')
+        self.assertEqual(UserStats.objects.get(user=dmitry).posts_count, 1)
+        response = self.client.get('/search/', {'q': 'кот'})
+        self.assertEqual([item.id for item in response.context['page']], [100])
+
+
+class TestExport(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        self.other = User.objects.create_user(username='sarah', password='12345')
+        self.group = Group.objects.create(title='test', slug='test')
+        self.post = Post.objects.create(text='Пост', author=self.user, group=self.group)
+        Post.objects.create(text='Чужой пост', author=self.other)
+        Comment.objects.create(post=self.post, author=self.other, text='Коммент')
+
+    def read(self, response):
+        content = b''.join(response.streaming_content)
+        if response['Content-Type'] == 'application/gzip':
+            content = gzip.decompress(content)
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_staff_only(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/export/')
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_endpoint(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+
+        rows = self.read(self.client.get('/export/'))
+        self.assertEqual(len(rows), 2)
+
+        rows = self.read(self.client.get('/export/', {'author': 'dmitry', 'gzip': '1', 'since': '2000-01-01'}))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['group'], {'slug': 'test', 'title': 'test'})
+        self.assertEqual([comment['author'] for comment in rows[0]['comments']], ['sarah'])
+
+        rows = self.read(self.client.get('/export/', {'until': '2000-01-01'}))
+        self.assertEqual(rows, [])
+
+        for value in ('0', 'false', ''):
+            response = self.client.get('/export/', {'gzip': value})
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        response = self.client.get('/export/', {'gzip': 'true'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'posts.ndjson.gz')
+            call_command('export_posts', output=path, gzip=True, group='test', chunk_size=1)
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual([row['id'] for row in rows], [self.post.id])
+
+
+class TestBenchmark(TestCase):
+    def test_run_and_compare(self):
+        seeded = seed.seed(users=5, groups=2, posts=30, follows=10, comments=20)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Follow.objects.count(), 10)
+
+        results = benchmark.run(seeded, requests=3)
+        self.assertEqual(set(results), set(benchmark.VIEWS))
+        for row in results.values():
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+
+        self.assertEqual(benchmark.compare(results, results), [])
+        slower = {view: dict(row, p95_ms=row['p95_ms'] * 2, queries_max=row['queries_max'] + 1)
+                  for view, row in results.items()}
+        self.assertEqual(len(benchmark.compare(slower, results)), 2 * len(results))
+
+
+class TestSQLiteCache(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': dict({'ACCESS_RESOLUTION': 0}, **options)})
+
+    def test_basic_operations(self):
+        self.cache.set('post', {'text': 'Пост'})
+        self.assertEqual(self.cache.get('post'), {'text': 'Пост'})
+        self.assertFalse(self.cache.add('post', 'другой'))
+        self.assertTrue(self.cache.add('new', 1))
+
+        self.cache.set_many({'a': 1, 'b': [2]})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'missing']), {'a': 1, 'b': [2]})
+
+        self.cache.set('expired', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertTrue(self.cache.add('expired', 2))
+
+        self.cache.delete_many(['a', 'b'])
+        self.assertFalse(self.cache.has_key('a'))
+
+    def test_incr_is_shared(self):
+        # второй экземпляр с тем же файлом ведёт себя как другой воркер
+        other = self.make_cache()
+        self.cache.set('counter', 1)
+        self.assertEqual(other.incr('counter', 5), 6)
+        self.assertEqual(self.cache.decr('counter'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction(self):
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_TARGET=1)
+        for key in 'abc':
+            cache.set(key, key)
+            time.sleep(0.01)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(cache.get_many('abcd'), {'a': 'a', 'c': 'c', 'd': 'd'})
+
+        cache = self.make_cache(MAX_SIZE=10000, CULL_TARGET=1)
+        cache.clear()
+        for number in range(10):
+            cache.set(number, 'x' * 3000)
+        self.assertEqual(sorted(cache.get_many(range(10))), [7, 8, 9])
+
+    def test_cull_to_low_water_mark(self):
+        cache = self.make_cache(MAX_ENTRIES=10)
+        for number in range(10):
+            cache.set(number, number)
+            time.sleep(0.01)
+        cache.get(0)
+        # после превышения лимита остаётся 90% записей, и следующая запись уже не чистит кеш
+        cache.set(10, 10)
+        self.assertEqual(sorted(cache.get_many(range(11))), [0, 3, 4, 5, 6, 7, 8, 9, 10])
+        cache.set(11, 11)
+        self.assertEqual(len(cache.get_many(range(12))), 10)
+
+        cache = self.make_cache(MAX_SIZE=10000)
+        cache.clear()
+        for number in range(4):
+            cache.set(number, 'x' * 3000)
+        self.assertEqual(sorted(cache.get_many(range(4))), [2, 3])
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_cache', keys=10, value_size=10, stdout=out)
+        self.assertIn('sqlite', out.getvalue())
+
+
+def add_database(testcase, alias, engine, path, **options):
+    """
+    Подключает на время теста ещё одну базу в файле path.
+    """
+    connections.databases[alias] = {'ENGINE': engine, 'NAME': path, 'OPTIONS': options}
+
+    def remove():
+        connections[alias].close()
+        del connections.databases[alias]
+        delattr(connections._connections, alias)
+    testcase.addCleanup(remove)
+    return connections[alias]
+
+
+class TestReplicaRouter(TestCase):
+    """
+    Реплику изображает отдельный файл SQLite, в котором лежат другие
+    данные, поэтому по ответу видно, из какой базы он прочитан.
+    """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        add_database(self, 'replica', 'django.db.backends.sqlite3', os.path.join(tmp.name, 'replica.sqlite3'))
+        override = override_settings(DATABASE_REPLICAS=['replica'])
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command('migrate', database='replica', verbosity=0)
+
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        self.author = User.objects.create_user(username='sarah', password='12345')
+        Post.objects.create(text='Пост на основной базе', author=self.author)
+        for user in (self.user, self.author):
+            User.objects.using('replica').bulk_create([User(pk=user.pk, username=user.username)])
+        replica_post = Post(text='Пост на реплике', author_id=self.author.pk)
+        replica_post.render_text()
+        Post.objects.using('replica').bulk_create([replica_post])
+        cache.clear()
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), 'default')
+        routers.set_replica('replica')
+        try:
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            self.assertEqual(router.db_for_read(Session), 'default')
+            self.assertEqual(router.db_for_write(Post), 'default')
+        finally:
+            routers.set_replica(None)
+
+    def test_reads_stick_to_primary_after_write(self):
+        response = self.client.get(f'/{self.author.username}/')
+        self.assertContains(response, 'Пост на реплике')
+        self.assertNotContains(response, 'Пост на основной базе')
+
+        # подписка пишет в основную базу и прикрепляет к ней пользователя
+        self.client.login(username='dmitry', password='12345')
+        response = self.client.get(f'/{self.author.username}/follow')
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        self.assertTrue(Follow.objects.using('default').filter(user=self.user, author=self.author).exists())
+        response = self.client.get(f'/{self.author.username}/')
+        self.assertContains(response, 'Пост на основной базе')
+
+        # после окна снова читаем с реплики
+        del self.client.cookies[routers.PIN_COOKIE]
+        response = self.client.get(f'/{self.author.username}/')
+        self.assertContains(response, 'Пост на реплике')
+
+    @override_settings(REPLICA_READ_VIEWS=['index'])
+    def test_cached_page_is_built_from_primary(self):
+        response = self.client.get('/')
+        self.assertContains(response, 'Пост на основной базе')
+        self.assertNotContains(response, 'Пост на реплике')
+
+
+class TestSQLiteBackend(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'db.sqlite3')
+
+    def test_pragmas(self):
+        connection = add_database(self, 'production', 'yatube.sqlite_backend', self.path)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_retries_locked_writes(self):
+        connection = add_database(self, 'production', 'yatube.sqlite_backend', self.path,
+                                  pragmas={'busy_timeout': 0}, write_retries=6, retry_backoff=0.02)
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE note (text TEXT)')
+
+        # другой процесс держит блокировку записи 0.2 секунды
+        other = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.addCleanup(other.close)
+        other.execute('BEGIN IMMEDIATE')
+        threading.Timer(0.2, other.rollback).start()
+        with connection.cursor() as cursor:
+            cursor.execute('INSERT INTO note VALUES (%s)', ['запись'])
+            cursor.execute('SELECT COUNT(*) FROM note')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        connection.write_retries = 0
+        other.execute('BEGIN IMMEDIATE')
+        with self.assertRaises(OperationalError), connection.cursor() as cursor:
+            cursor.execute('INSERT INTO note VALUES (%s)', ['запись'])
+        other.rollback()
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_sqlite_writes', processes=2, writes=5, stdout=out)
+        self.assertIn('production', out.getvalue())
+
+
+class TestQueryPlans(TestCase):
+    def test_views_use_indexes(self):
+        seeded = seed.seed(users=10, groups=3, posts=50, follows=20, comments=50)
+        found = query_plan.check(seeded)
+        self.assertEqual(found, [], '\n'.join(f'{row["view"]}: {row["sql"]} {row["plan"]}' for row in found))
+
+    def test_detects_full_scan(self):
+        queryset = Post.objects.filter(text='Пост').order_by('modified')
+        sql, params = queryset.query.sql_with_params()
+        found = query_plan.problems(sql, query_plan.explain(sql, params))
+        self.assertEqual(len(found), 2)
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(METRICS_DB=os.path.join(tmp.name, 'metrics.sqlite3'))
+        override.enable()
+        self.addCleanup(override.disable)
+        metrics.registry.pending.clear()
+
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        Post.objects.create(text='Пост', author=self.user)
+        cache.clear()
+
+    def test_metrics_endpoint(self):
+        self.client.get('/')
+        self.client.get('/')
+        self.client.get(f'/{self.user.username}/')
+        text = self.client.get('/metrics/').content.decode()
+
+        self.assertIn('# TYPE yatube_http_request_duration_seconds histogram', text)
+        self.assertIn('yatube_http_request_duration_seconds_bucket{view="index",le="+Inf"} 2.0', text)
+        self.assertIn('yatube_http_request_duration_seconds_count{view="profile"} 1.0', text)
+        self.assertIn('yatube_http_requests_total{view="index",method="GET",status="200"} 2.0', text)
+        # на главной 2 запроса без кеша и 0 из кеша
+        self.assertIn('yatube_db_queries_total{view="index"} 2.0', text)
+        self.assertIn('yatube_cache_requests_total{view="index",cache="page",result="hit"} 1.0', text)
+        self.assertIn('yatube_cache_requests_total{view="index",cache="page",result="miss"} 1.0', text)
+        # карточка поста уже отрисована на главной и берётся из кеша
+        self.assertIn('yatube_cache_requests_total{view="profile",cache="post_card",result="hit"} 1.0', text)
+        self.assertIn('yatube_template_render_seconds_total{view="profile"}', text)
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+
+def render(text):
+    """
+    Готовит HTML текста поста и начало текста для лент.
+    Считается при сохранении поста, а не при каждой отрисовке.
+    """
+    excerpt = Truncator(text).chars(settings.POST_EXCERPT_LENGTH)
+    return {
+        'text_html': str(linebreaksbr(text)),
+        'excerpt_html': str(linebreaksbr(excerpt)),
+        'truncated': excerpt != text,
+    }
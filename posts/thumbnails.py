@@ -0,0 +1,32 @@
+from sorl.thumbnail import get_thumbnail
+
+from jobs.queue import enqueue
+
+# должны совпадать с тегом thumbnail в post_item.html
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def generate(image):
+    return get_thumbnail(image, GEOMETRY, **OPTIONS)
+
+
+def generate_name(name):
+    """
+    Создает миниатюру по имени файла, возвращает текст ошибки или None.
+    """
+    try:
+        generate(name)
+    except Exception as e:
+        return f'{name}: {e}'
+    return None
+
+
+def schedule(post):
+    """
+    Ставит создание миниатюры поста в очередь задач.
+    """
+    if not post.image:
+        return
+    name = post.image.name
+    enqueue('posts.thumbnails.generate', [name], dedupe_key=f'thumbnail:{name}')
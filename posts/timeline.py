@@ -0,0 +1,85 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Post, Follow, TimelineEntry
+from .paginator import CursorPaginator
+
+BATCH_SIZE = 500
+
+
+def _bulk_insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """
+    Раскладывает новый пост по лентам подписчиков автора.
+    """
+    follower_ids = Follow.objects.filter(author=post.author_id).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk, author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in follower_ids.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """
+    Добавляет в ленту подписчика последние посты автора.
+    """
+    posts = Post.objects.filter(author=author_id).order_by('-pub_date').values_list('id', 'pub_date')
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in posts[:settings.TIMELINE_BACKFILL]
+    )
+
+
+def trim(user_id, author_id):
+    TimelineEntry.objects.filter(user=user_id, author=author_id).delete()
+
+
+def feed(user):
+    # сортируем по копии pub_date в ленте, её покрывает индекс (user, -pub_date, -post)
+    return Post.objects.filter(timeline_entries__user=user).order_by('-timeline_entries__pub_date')
+
+
+class FeedPaginator(CursorPaginator):
+    """
+    Курсорная пагинация ленты подписок по записям TimelineEntry.
+
+    Ключ (pub_date, post_id) берётся из индекса (user, -pub_date, -post),
+    поэтому страница читается из индекса, а посты затем загружаются одним запросом.
+    """
+
+    def __init__(self, user, per_page=10):
+        entries = TimelineEntry.objects.filter(user=user).only('pub_date', 'post')
+        super().__init__(entries, per_page, key='post_id')
+
+    def resolve(self, rows):
+        posts = Post.objects.for_list().in_bulk([entry.post_id for entry in rows])
+        return [posts[entry.post_id] for entry in rows if entry.post_id in posts]
+
+
+def rebuild():
+    """
+    Пересобирает все ленты одним INSERT ... SELECT: каждый подписчик
+    получает TIMELINE_BACKFILL последних постов автора, как при backfill.
+    """
+    entries, follows, posts = TimelineEntry._meta.db_table, Follow._meta.db_table, Post._meta.db_table
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {entries} (user_id, post_id, author_id, pub_date) '
+                f'SELECT f.user_id, p.id, p.author_id, p.pub_date FROM {follows} f JOIN ('
+                f'SELECT id, author_id, pub_date, '
+                f'ROW_NUMBER() OVER (PARTITION BY author_id ORDER BY pub_date DESC, id DESC) AS position '
+                f'FROM {posts}) p ON p.author_id = f.author_id '
+                f'WHERE p.position <= %s', [settings.TIMELINE_BACKFILL])
+            return cursor.rowcount
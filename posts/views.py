@@ -1,65 +1,130 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.http import JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition
 
-from .models import Post, Group, User, Comment, Follow
+from .models import Post, Group, User, Comment, Follow, TimelineEntry
+from . import conditional, export, search as post_search, stats, thumbnails, timeline
+from .cache import single_flight_cache_page
 from .forms import PostForm, CommentForm
+from .paginator import CursorPaginator, paginate
 
 
-@cache_page(20)
+@single_flight_cache_page(settings.INDEX_CACHE_TIMEOUT)
 def index(request):
-    post_list = Post.objects.order_by('-pub_date').all()
+    post_list = Post.objects.for_list().order_by('-pub_date')
 
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator, page = paginate(request, post_list, count_list=Post.objects.all())
 
     return render(request, 'index.html', {'page': page, 'paginator': paginator, })
 
 
+@condition(etag_func=conditional.group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group).order_by('-pub_date').all()
+    posts = Post.objects.for_list().filter(group=group).order_by('-pub_date')
 
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator, page = paginate(request, posts, count_list=Post.objects.filter(group=group))
 
     return render(request, 'group.html', {'group': group, 'page': page, 'paginator': paginator})
 
 
+@condition(etag_func=conditional.profile_etag)
 def profile(request, username):
     user = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=user.id).order_by('-pub_date')
-    count_post = post_list.count()
+    post_list = Post.objects.for_list().filter(author=user.id).order_by('-pub_date')
+    user_stats = stats.get_stats(user)
 
-    follow_count = Follow.objects.filter(user=user.id).count()
-    following = Follow.objects.filter(author=user.id).count()
-
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator, page = paginate(request, post_list, count_list=Post.objects.filter(author=user.id))
 
     return render(request, 'profile.html', {'page': page, 'paginator': paginator,
-                                            'profile_user': user, 'count_post': count_post, 'following': following,
-                                            'follow_count': follow_count})
+                                            'profile_user': user, 'count_post': user_stats.posts_count,
+                                            'following': user_stats.followers_count,
+                                            'follow_count': user_stats.following_count})
 
 
+@condition(etag_func=conditional.post_etag)
 def post_view(request, username, post_id):
     user = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, id=post_id)
-    count_post = Post.objects.filter(author=user.id).order_by('-pub_date').count()
-
-    follow_count = Follow.objects.filter(user=user.id).count()
-    following = Follow.objects.filter(author=user.id).count()
-
-    comments = Comment.objects.filter(post_id=post_id).order_by('-created')
+    post = get_object_or_404(Post.objects.for_feed().defer('text', 'excerpt_html'), id=post_id)
+    user_stats = stats.get_stats(user)
+
+    # первая порция комментариев с авторами, остальные подгружает post_comments
+    per_page = settings.COMMENTS_PER_PAGE
+    comments = Comment.objects.filter(post_id=post_id).select_related('author').order_by('-created', '-pk')[:per_page]
+    next_cursor = None
+    if post.comment_count > per_page:
+        next_cursor = CursorPaginator(comments, per_page, field='created').encode_cursor(list(comments)[-1])
     comment_form = CommentForm()
 
     return render(request, 'post.html',
-                  {'profile_user': user, 'post': post, 'count_post': count_post, 'form': comment_form,
-                   'items': comments, 'following': following, 'follow_count': follow_count})
+                  {'profile_user': user, 'post': post, 'count_post': user_stats.posts_count, 'form': comment_form,
+                   'items': comments, 'next_cursor': next_cursor,
+                   'comments_url': reverse('post_comments', args=[username, post_id]),
+                   'following': user_stats.followers_count, 'follow_count': user_stats.following_count})
+
+
+def post_comments(request, username, post_id):
+    """
+    Следующая порция комментариев для кнопки «Показать ещё».
+    """
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id, author__username=username)
+    comments = Comment.objects.filter(post=post).select_related('author')
+    paginator = CursorPaginator(comments, settings.COMMENTS_PER_PAGE, field='created')
+    page = paginator.get_page(request.GET.get('cursor'))
+
+    return render(request, 'comments_chunk.html',
+                  {'items': page, 'next_cursor': page.next_cursor, 'comments_url': request.path})
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(post_search.SearchResults(query), 10)
+    page = paginator.get_page(request.GET.get('page'))
+
+    return render(request, 'search.html', {'query': query, 'page': page, 'paginator': paginator})
+
+
+def search_api(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(post_search.SearchResults(query), 10)
+    page = paginator.get_page(request.GET.get('page'))
+
+    results = [{
+        'id': post.id,
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'comment_count': post.comment_count,
+        'url': request.build_absolute_uri(reverse('post', args=[post.author.username, post.id])),
+    } for post in page]
+
+    return JsonResponse({'query': query, 'count': paginator.count, 'page': page.number,
+                         'num_pages': paginator.num_pages, 'results': results},
+                        json_dumps_params={'ensure_ascii': False})
+
+
+@staff_member_required
+def export_posts(request):
+    try:
+        posts = export.filter_posts(request.GET.get('author'), request.GET.get('group'),
+                                    request.GET.get('since'), request.GET.get('until'))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    chunks = export.ndjson(export.records(posts))
+    if request.GET.get('gzip') in ('1', 'true'):
+        response = StreamingHttpResponse(export.gzipped(chunks), content_type='application/gzip')
+        response['Content-Disposition'] = 'attachment; filename="posts.ndjson.gz"'
+    else:
+        response = StreamingHttpResponse(chunks, content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="posts.ndjson"'
+    return response
 
 
 def page_not_found(request, exception):
@@ -82,7 +147,9 @@ def post_edit(request, username, post_id):
 
     if request.method == 'POST':
         if form.is_valid():
-            form.save()
+            post = form.save()
+            if 'image' in form.changed_data:
+                thumbnails.schedule(post)
             return redirect('post', username=request.user.username, post_id=post_id)
 
     return render(request, 'post_new.html', {'form': form, 'post': post})
@@ -97,7 +164,8 @@ def new_post(request):
             return render(request, 'post_new.html', {'form': form})
 
         form.instance.author = request.user
-        form.save()
+        post = form.save()
+        thumbnails.schedule(post)
 
         return redirect('index')
 
@@ -122,12 +190,10 @@ def add_comment(request, username, post_id):
 
 @login_required
 def follow_index(request):
-    follow_authors = Follow.objects.filter(user=request.user).values('author')
-    post_list = Post.objects.filter(author__in=follow_authors).order_by('-pub_date')
+    post_list = timeline.feed(request.user).for_list()
 
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator, page = paginate(request, post_list, count_list=TimelineEntry.objects.filter(user=request.user),
+                               cursor_paginator=timeline.FeedPaginator(request.user))
 
     return render(request, "follow.html", {'page': page, 'paginator': paginator, })
 
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def user_key(user_id):
+    return f'users:user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    Берёт пользователя текущей сессии из кеша, а не из auth_user.
+
+    Запись сбрасывается сигналами при сохранении и удалении пользователя,
+    в том числе при смене пароля. Изменения через QuerySet.update()
+    сигналов не вызывают и видны только по истечении USER_CACHE_TIMEOUT.
+    """
+
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
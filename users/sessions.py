@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+
+
+class SessionStore(cached_db.SessionStore):
+    """
+    Сессии читаются из кеша, а в базу изменения пишутся не чаще раза
+    в SESSION_WRITE_BEHIND секунд.
+
+    Новая сессия и первое сохранение после её создания пишутся в базу сразу:
+    при входе create() сохраняет сессию ещё без данных пользователя,
+    и они попадают в базу только следующим save(). Если кеш потеряет запись, сессия восстановится из базы с данными
+    не старше SESSION_WRITE_BEHIND секунд.
+    """
+
+    def synced_key(self, session_key):
+        return f'{self.cache_key_prefix}{session_key}:synced'
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        if must_create:
+            return super().save(must_create)
+        # add удаётся только первому сохранению за интервал, оно и пишет в базу
+        if self._cache.add(self.synced_key(self.session_key), True, settings.SESSION_WRITE_BEHIND):
+            super().save()
+        else:
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+
+    def delete(self, session_key=None):
+        session_key = session_key or self.session_key
+        super().delete(session_key)
+        if session_key is not None:
+            self._cache.delete(self.synced_key(session_key))
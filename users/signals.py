@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .backends import user_key
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    cache.delete(user_key(instance.pk))
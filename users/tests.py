@@ -1,3 +1,108 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
 
-# Create your tests here.
+from jobs import queue
+from .backends import CachedModelBackend
+from .sessions import SessionStore
+
+
+class TestCachedSessions(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def db_data(self, store):
+        return store.decode(Session.objects.get(session_key=store.session_key).session_data)
+
+    def test_write_behind(self):
+        store = SessionStore()
+        store['step'] = 1
+        store.create()
+        store['step'] = 2
+        store.save()
+        self.assertEqual(self.db_data(store), {'step': 2})
+
+        # в пределах интервала изменения попадают только в кеш
+        store['step'] = 3
+        store.save()
+        self.assertEqual(self.db_data(store), {'step': 2})
+        self.assertEqual(SessionStore(store.session_key)['step'], 3)
+
+        cache.delete(store.synced_key(store.session_key))
+        store['step'] = 4
+        store.save()
+        self.assertEqual(self.db_data(store), {'step': 4})
+
+    def test_login_survives_cache_loss(self):
+        user = User.objects.create_user(username='dmitry', password='12345')
+        client = Client()
+        client.force_login(user)
+        cache.clear()
+        self.assertEqual(client.get('/follow/').status_code, 200)
+
+    def test_restored_from_db(self):
+        store = SessionStore()
+        store['step'] = 1
+        store.create()
+        cache.clear()
+        self.assertEqual(SessionStore(store.session_key)['step'], 1)
+
+    def test_delete(self):
+        store = SessionStore()
+        store['step'] = 1
+        store.create()
+        store.delete()
+        self.assertFalse(Session.objects.filter(session_key=store.session_key).exists())
+        self.assertEqual(SessionStore(store.session_key).load(), {})
+
+
+class TestCachedUser(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='dmitry', password='12345')
+        cache.clear()
+
+    def test_no_auth_queries(self):
+        self.client.force_login(self.user)
+        self.client.get('/follow/')
+        with self.assertNumQueries(0):
+            user = CachedModelBackend().get_user(self.user.pk)
+        self.assertEqual(user, self.user)
+
+    def test_invalidated_on_save(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        self.user.first_name = 'Дмитрий'
+        self.user.save()
+        self.assertEqual(backend.get_user(self.user.pk).first_name, 'Дмитрий')
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(backend.get_user(self.user.pk))
+
+    def test_password_change_logs_out(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/follow/')
+        self.assertEqual(response.status_code, 200)
+
+        self.user.set_password('new-password')
+        self.user.save()
+        response = self.client.get('/follow/')
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(EMAIL_BACKEND='jobs.mail.OutboxBackend',
+                   OUTBOX_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', OUTBOX_DELAY=0)
+class TestPasswordReset(TestCase):
+    def test_mail_is_queued(self):
+        User.objects.create_user(username='dmitry', password='12345', email='dmitry@example.com')
+        response = Client().post('/auth/password_reset/', {'email': 'dmitry@example.com'})
+        self.assertRedirects(response, '/auth/password_reset/done/')
+        self.assertEqual(len(mail.outbox), 0)
+
+        queue.run(queue.claim())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['dmitry@example.com'])
+        self.assertIn('/auth/reset/', mail.outbox[0].body)
@@ -1,6 +1,6 @@
 import datetime as dt
 
-from django.core.mail import send_mail
+from django.core import mail
 
 
 def year(request):
@@ -15,10 +15,14 @@ def year(request):
 
 
 def send_mail(request):
-    send_mail(
+    """
+    Отправляет письмо через EMAIL_BACKEND: в очередь отправки, а не сразу на сервер.
+    """
+    mail.send_mail(
         'Тема письма',
         'Текст письма.',
         'from@example.com',
         ['to@example.com'],
         fail_silently=False,
     )
+    return {}
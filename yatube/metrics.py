@@ -0,0 +1,194 @@
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.template.backends.django import Template
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+FAMILIES = {
+    'yatube_http_request_duration_seconds': ('histogram', 'Время обработки запроса'),
+    'yatube_http_requests_total': ('counter', 'Количество запросов'),
+    'yatube_db_queries_total': ('counter', 'Количество SQL-запросов'),
+    'yatube_db_query_duration_seconds_total': ('counter', 'Время выполнения SQL-запросов'),
+    'yatube_template_render_seconds_total': ('counter', 'Время отрисовки шаблонов'),
+    'yatube_cache_requests_total': ('counter', 'Обращения к кешу страниц и карточек'),
+    'yatube_jobs_total': ('counter', 'Выполненные задачи очереди по результату'),
+    'yatube_job_latency_seconds': ('histogram', 'Ожидание задачи в очереди до запуска'),
+    'yatube_job_duration_seconds': ('histogram', 'Время выполнения задачи'),
+}
+
+_local = threading.local()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.rendering = False
+        self.cache = defaultdict(int)
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+
+class Registry:
+    """
+    Копит метрики в памяти процесса и периодически сбрасывает их
+    в общий файл SQLite, где суммируются значения всех воркеров.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(float)
+        self.last_flush = time.monotonic()
+
+    def add(self, name, labels, value=1.0):
+        with self.lock:
+            self.pending[name, labels] += value
+
+    def observe(self, family, labels, value):
+        for bucket in BUCKETS:
+            if value <= bucket:
+                self.add(f'{family}_bucket', f'{labels},le="{bucket}"')
+        self.add(f'{family}_bucket', f'{labels},le="+Inf"')
+        self.add(f'{family}_sum', labels, value)
+        self.add(f'{family}_count', labels)
+
+    def connect(self):
+        db = sqlite3.connect(settings.METRICS_DB, timeout=5)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('CREATE TABLE IF NOT EXISTS metrics ('
+                   'name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (name, labels))')
+        return db
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(float)
+            self.last_flush = time.monotonic()
+        if not pending:
+            return
+        db = self.connect()
+        try:
+            with db:
+                db.executemany(
+                    'INSERT INTO metrics (name, labels, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                    [(name, labels, value) for (name, labels), value in pending.items()])
+        finally:
+            db.close()
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def render(self):
+        self.flush()
+        db = self.connect()
+        try:
+            rows = db.execute('SELECT name, labels, value FROM metrics').fetchall()
+        finally:
+            db.close()
+
+        lines = []
+        current = None
+        for _, family, name, labels, value in sorted((_sort_key(name, labels), _family(name), name, labels, value)
+                                                     for name, labels, value in rows):
+            if family != current:
+                current = family
+                kind, description = FAMILIES.get(family, ('untyped', ''))
+                lines += [f'# HELP {family} {description}', f'# TYPE {family} {kind}']
+            lines.append(f'{name}{{{labels}}} {value!r}' if labels else f'{name} {value!r}')
+        return '\n'.join(lines) + '\n'
+
+
+def _family(name):
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in FAMILIES:
+            return name[:-len(suffix)]
+    return name
+
+
+def _sort_key(name, labels):
+    # бакеты гистограммы идут по возрастанию границы, +Inf последним
+    base, _, le = labels.partition(',le="')
+    return _family(name), name, base, float(le.rstrip('"')) if le else 0.0
+
+
+registry = Registry()
+
+
+def record_cache(cache_name, hits=0, misses=0):
+    """
+    Учитывает попадания и промахи кеша в метриках текущего запроса.
+    """
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats.cache[cache_name, 'hit'] += hits
+        stats.cache[cache_name, 'miss'] += misses
+
+
+def _instrument_templates():
+    if getattr(Template.render, 'instrumented', False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        stats = getattr(_local, 'stats', None)
+        if stats is None or stats.rendering:
+            return original(self, context, request)
+        stats.rendering = True
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - started
+            stats.rendering = False
+
+    render.instrumented = True
+    Template.render = render
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instrument_templates()
+
+    def __call__(self, request):
+        stats = _local.stats = RequestStats()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats.db_wrapper))
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        labels = f'view="{match.url_name if match and match.url_name else "unmatched"}"'
+        registry.observe('yatube_http_request_duration_seconds', labels, duration)
+        registry.add('yatube_http_requests_total', f'{labels},method="{request.method}",status="{response.status_code}"')
+        registry.add('yatube_db_queries_total', labels, stats.queries)
+        registry.add('yatube_db_query_duration_seconds_total', labels, stats.db_seconds)
+        registry.add('yatube_template_render_seconds_total', labels, stats.template_seconds)
+        for (cache_name, result), count in stats.cache.items():
+            registry.add('yatube_cache_requests_total', f'{labels},cache="{cache_name}",result="{result}"', count)
+        registry.maybe_flush()
+        return response
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
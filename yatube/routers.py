@@ -0,0 +1,81 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+
+PIN_COOKIE = 'primary_pin'
+
+_state = threading.local()
+
+
+def get_replica():
+    return getattr(_state, 'replica', None)
+
+
+def set_replica(alias):
+    _state.replica = alias
+
+
+class ReplicaRouter:
+    """
+    Отправляет чтение на реплику, выбранную ReplicaMiddleware для текущего
+    запроса, а запись и всё остальное — на основную базу.
+
+    Сессии всегда читаются с основной базы: только что созданная сессия
+    может ещё не доехать до реплики.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in settings.REPLICA_EXCLUDED_APPS:
+            return 'default'
+        return get_replica() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Выбирает реплику для представлений из REPLICA_READ_VIEWS.
+
+    После записи (любой POST или представление из REPLICA_WRITE_VIEWS)
+    пользователь получает куку, и следующие REPLICA_PIN_SECONDS секунд
+    его чтение идёт с основной базы, чтобы он сразу видел свои изменения.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            set_replica(None)
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match else None
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') or url_name in settings.REPLICA_WRITE_VIEWS:
+            pin_seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(PIN_COOKIE, str(time.time() + pin_seconds), max_age=pin_seconds, httponly=True)
+        return response
+
+    def is_pinned(self, request):
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or request.method not in ('GET', 'HEAD'):
+            return None
+        if request.resolver_match.url_name in settings.REPLICA_READ_VIEWS and not self.is_pinned(request):
+            set_replica(random.choice(replicas))
+        return None
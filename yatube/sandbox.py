@@ -0,0 +1,26 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+
+
+@contextmanager
+def temporary_storage():
+    """
+    Подменяет общий кеш и файл метрик временными, чтобы тесты и замеры
+    не читали и не очищали рабочие cache.sqlite3 и metrics.sqlite3.
+
+    Кеши SQLite переезжают во временный каталог, остальные заменяются
+    LocMemCache текущего процесса.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        caches = {}
+        for alias, config in settings.CACHES.items():
+            if config['BACKEND'] == 'yatube.sqlite_cache.SQLiteCache':
+                caches[alias] = dict(config, LOCATION=os.path.join(directory, f'{alias}.sqlite3'))
+            else:
+                caches[alias] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': alias}
+        with override_settings(CACHES=caches, METRICS_DB=os.path.join(directory, 'metrics.sqlite3')):
+            yield directory
@@ -31,14 +31,18 @@ ALLOWED_HOSTS = [
     'testserver'
 ]
 
-EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+# Письма копятся в таблице и отправляются воркером очереди, см. jobs/mail.py
+EMAIL_BACKEND = "jobs.mail.OutboxBackend"
+# Через какой бэкенд воркер на самом деле отправляет письма
+OUTBOX_EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 # Application definition
 
 INSTALLED_APPS = [
-    'posts',
-    'users',
+    'posts.apps.PostConfig',
+    'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
     'django.contrib.sites',
     'django.contrib.flatpages',
     'django.contrib.admin',
@@ -52,6 +56,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +64,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'yatube.routers.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -85,13 +91,45 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Боевой режим SQLite (yatube/sqlite_backend): WAL, настроенные PRAGMA,
+# BEGIN IMMEDIATE, повтор при блокировках и постоянные соединения
+SQLITE_PRODUCTION = bool(os.environ.get('YATUBE_SQLITE_PRODUCTION'))
+SQLITE_ENGINE = 'yatube.sqlite_backend' if SQLITE_PRODUCTION else 'django.db.backends.sqlite3'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': SQLITE_ENGINE,
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600 if SQLITE_PRODUCTION else 0,
     }
 }
 
+# Реплики для чтения лент, см. yatube/routers.py
+DATABASE_ROUTERS = ['yatube.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+if os.environ.get('YATUBE_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': SQLITE_ENGINE,
+        'NAME': os.environ['YATUBE_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
+
+# Главная страница кешируется для всех и строится с основной базы, см. posts/cache.py
+REPLICA_READ_VIEWS = ['group', 'profile', 'post', 'post_comments', 'follow_index']
+REPLICA_WRITE_VIEWS = ['new_post', 'post_edit', 'add_comment', 'profile_follow', 'profile_unfollow']
+REPLICA_EXCLUDED_APPS = ['sessions']
+# Сколько секунд после записи пользователь читает с основной базы
+REPLICA_PIN_SECONDS = 10
+
+# Сессии и пользователь текущей сессии читаются из кеша, см. users/sessions.py
+SESSION_ENGINE = 'users.sessions'
+# Не чаще чем раз в столько секунд изменения сессии записываются в базу
+SESSION_WRITE_BEHIND = 60
+
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+USER_CACHE_TIMEOUT = 60 * 60
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -111,12 +149,40 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Общий для всех воркеров кеш в файле SQLite, см. yatube/sqlite_cache.py
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.sqlite_cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
 
+# Тесты работают с кешем и метриками во временном каталоге
+TEST_RUNNER = 'yatube.test_runner.TemporaryStorageRunner'
+
+# Главная страница сбрасывается по сигналам, поэтому TTL может быть большим
+INDEX_CACHE_TIMEOUT = 60 * 60
+
+# Сколько ещё отдавать устаревшую страницу, пока один запрос её пересчитывает
+PAGE_CACHE_STALE_TIMEOUT = 60 * 10
+# Срок блокировки пересчёта и предел ожидания, когда страницы в кеше нет
+PAGE_CACHE_LOCK_TIMEOUT = 10
+# Насколько рано начинать вероятностный пересчёт (XFetch), 0 — только по сроку
+PAGE_CACHE_XFETCH_BETA = 1.0
+
+# Сколько символов текста поста показывать в лентах
+POST_EXCERPT_LENGTH = 500
+
+# Комментариев на странице поста и в каждой подгружаемой порции
+COMMENTS_PER_PAGE = 20
+
+# Отрисованные карточки постов, ключ меняется при правке поста и новых комментариях
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -144,3 +210,29 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = 'index'
+
+# Курсорная пагинация лент вместо COUNT(*) + OFFSET
+POSTS_CURSOR_PAGINATION = False
+
+# Сколько последних постов автора попадает в ленту при подписке
+TIMELINE_BACKFILL = 1000
+
+# Очередь задач в базе, см. jobs/queue.py и manage.py run_workers
+JOBS_WORKERS = 2
+JOBS_MAX_ATTEMPTS = 5
+# Пауза перед повтором: JOBS_BACKOFF * 2^(попытка - 1), но не больше JOBS_BACKOFF_MAX секунд
+JOBS_BACKOFF = 10
+JOBS_BACKOFF_MAX = 60 * 60
+# Задача, выполняющаяся дольше, считается брошенной и возвращается в очередь
+JOBS_TIMEOUT = 60 * 10
+# Сколько хранить выполненные задачи
+JOBS_KEEP_DONE = 60 * 60 * 24
+
+# Сколько секунд копить письма перед отправкой, писем на пачку и попыток на письмо
+OUTBOX_DELAY = 2
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 5
+
+# Общий файл метрик для всех воркеров и период сброса накопленного в него
+METRICS_DB = os.path.join(BASE_DIR, 'metrics.sqlite3')
+METRICS_FLUSH_INTERVAL = 5
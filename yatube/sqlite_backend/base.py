@@ -0,0 +1,87 @@
+import random
+import time
+
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # отрицательное значение — размер в килобайтах, а не в страницах
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+OPTIONS = {
+    'pragmas': {},
+    'write_retries': 5,
+    'retry_backoff': 0.05,
+}
+
+
+class RetryingCursorWrapper(base.SQLiteCursorWrapper):
+    """
+    Повторяет запрос при "database is locked", если он выполняется вне
+    транзакции: внутри atomic() повторять надо всю транзакцию целиком.
+    """
+    database = None
+
+    def _retry(self, method, *args):
+        database = self.database
+        attempt = 0
+        while True:
+            try:
+                return method(self, *args)
+            except base.Database.OperationalError as e:
+                if 'locked' not in str(e) or database.in_atomic_block or attempt >= database.write_retries:
+                    raise
+            # экспоненциальная задержка со случайным разбросом, чтобы процессы не просыпались разом
+            time.sleep(database.retry_backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+            attempt += 1
+
+    def execute(self, query, params=None):
+        return self._retry(base.SQLiteCursorWrapper.execute, query, params)
+
+    def executemany(self, query, param_list):
+        return self._retry(base.SQLiteCursorWrapper.executemany, query, param_list)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite для боевого режима: WAL и настроенные PRAGMA на каждом новом
+    соединении, BEGIN IMMEDIATE для транзакций и повтор заблокированных
+    запросов с нарастающей задержкой.
+
+    В OPTIONS дополнительно понимает pragmas (поверх PRAGMAS),
+    write_retries и retry_backoff (секунды).
+    """
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # свои ключи OPTIONS не передаём в sqlite3.connect
+        self.pragmas = {**PRAGMAS, **kwargs.pop('pragmas', OPTIONS['pragmas'])}
+        self.write_retries = kwargs.pop('write_retries', OPTIONS['write_retries'])
+        self.retry_backoff = kwargs.pop('retry_backoff', OPTIONS['retry_backoff'])
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = dict(self.pragmas)
+        if self.is_in_memory_db():
+            # у базы в памяти нет журнала на диске
+            pragmas.pop('journal_mode', None)
+            pragmas.pop('mmap_size', None)
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=RetryingCursorWrapper)
+        cursor.database = self
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        # сразу берём блокировку записи: при обычном BEGIN повышение блокировки
+        # посреди транзакции падает с "database is locked" без ожидания busy_timeout
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,236 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# ограничение SQLite на число параметров в одном запросе
+CHUNK_SIZE = 500
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL NOT NULL, size INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    # число записей и суммарный размер ведут триггеры, чтобы не считать COUNT(*) на каждую запись
+    'CREATE TABLE IF NOT EXISTS cache_totals ('
+    'id INTEGER PRIMARY KEY CHECK (id = 1), entries INTEGER NOT NULL, size INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO cache_totals VALUES (1, 0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN '
+    'UPDATE cache_totals SET entries = entries + 1, size = size + new.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN '
+    'UPDATE cache_totals SET entries = entries - 1, size = size - old.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache BEGIN '
+    'UPDATE cache_totals SET size = size + new.size - old.size; END',
+]
+
+UPSERT = ('INSERT INTO cache (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?) '
+          'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+          'accessed = excluded.accessed, size = excluded.size')
+
+
+def _chunks(items):
+    items = list(items)
+    for start in range(0, len(items), CHUNK_SIZE):
+        yield items[start:start + CHUNK_SIZE]
+
+
+class SQLiteCache(BaseCache):
+    """
+    Кеш в общем файле SQLite в режиме WAL, один на все процессы сервера.
+
+    Целые числа хранятся как INTEGER, поэтому incr выполняется одним UPDATE.
+    При превышении MAX_ENTRIES или MAX_SIZE (байт) удаляются просроченные,
+    а затем самые давно читанные записи, пока не останется доля CULL_TARGET от обоих лимитов:
+    запас избавляет от очистки на каждой следующей записи. Время чтения обновляется не чаще раза
+    в ACCESS_RESOLUTION секунд, чтобы горячие ключи не занимали блокировку записи.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        cull_target = float(options.get('CULL_TARGET', 0.9))
+        self._cull_entries = int(self._max_entries * cull_target)
+        self._cull_size = int(self._max_size * cull_target)
+        self._access_resolution = float(options.get('ACCESS_RESOLUTION', 10))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # соединение своё у каждого потока и у каждого процесса после fork
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self._path, timeout=self._busy_timeout, isolation_level=None,
+                                 check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            with db:
+                db.execute('BEGIN IMMEDIATE')
+                for statement in SCHEMA:
+                    db.execute(statement)
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _write(self):
+        # BEGIN IMMEDIATE сразу берёт блокировку записи и не ловит SQLITE_BUSY посреди транзакции
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        return db
+
+    def _encode(self, value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value, 8
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return data, len(data)
+
+    def _decode(self, value):
+        if isinstance(value, bytes):
+            return pickle.loads(value)
+        return value
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _touch_accessed(self, keys, now):
+        if keys:
+            with self._write() as db:
+                db.executemany('UPDATE cache SET accessed = ? WHERE key = ?', [(now, key) for key in keys])
+
+    def _delete_expired(self, keys, now):
+        if keys:
+            with self._write() as db:
+                db.executemany('DELETE FROM cache WHERE key = ? AND expires <= ?', [(key, now) for key in keys])
+
+    def _fetch(self, keys):
+        now = time.time()
+        found, stale, expired = {}, [], []
+        for chunk in _chunks(keys):
+            rows = self._db.execute(
+                'SELECT key, value, expires, accessed FROM cache WHERE key IN (%s)' % ','.join('?' * len(chunk)), chunk)
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    expired.append(key)
+                    continue
+                found[key] = value
+                if now - accessed >= self._access_resolution:
+                    stale.append(key)
+        self._delete_expired(expired, now)
+        self._touch_accessed(stale, now)
+        return found
+
+    def _cull(self, db, now):
+        entries, size = db.execute('SELECT entries, size FROM cache_totals').fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        entries, size = db.execute('SELECT entries, size FROM cache_totals').fetchone()
+        if entries > self._cull_entries:
+            db.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                       (entries - self._cull_entries,))
+            size = db.execute('SELECT size FROM cache_totals').fetchone()[0]
+        if size > self._cull_size:
+            # оставляем самые свежие записи, суммарный размер которых влезает в CULL_TARGET от лимита
+            db.execute('DELETE FROM cache WHERE key IN (SELECT key FROM ('
+                       'SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS total FROM cache) '
+                       'WHERE total > ?)', (self._cull_size,))
+
+    def _set(self, items, timeout, only_new=False):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        added = 0
+        with self._write() as db:
+            for key, value in items:
+                data, size = self._encode(value)
+                if only_new:
+                    cursor = db.execute(
+                        'INSERT INTO cache (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?) '
+                        'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+                        'accessed = excluded.accessed, size = excluded.size WHERE cache.expires <= ?',
+                        (key, data, expires, now, size, now))
+                else:
+                    cursor = db.execute(UPSERT, (key, data, expires, now, size))
+                added += cursor.rowcount
+            self._cull(db, now)
+        return added
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._set([(self._key(key, version), value)], timeout, only_new=True) > 0
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        found = self._fetch([key])
+        if key not in found:
+            return default
+        return self._decode(found[key])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set([(self._key(key, version), value)], timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            cursor = db.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), now, key, now))
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._write() as db:
+            db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._db.execute('SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                               (key, time.time())).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            row = db.execute('SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                             (key, now)).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            if isinstance(row[0], int):
+                value = row[0] + delta
+                db.execute('UPDATE cache SET value = ?, accessed = ? WHERE key = ?', (value, now, key))
+            else:
+                # не целое число: пересчитываем в Python внутри той же транзакции
+                value = self._decode(row[0]) + delta
+                data, size = self._encode(value)
+                db.execute('UPDATE cache SET value = ?, size = ?, accessed = ? WHERE key = ?',
+                           (data, size, now, key))
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._fetch(keys)
+        return {keys[key]: self._decode(value) for key, value in found.items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set([(self._key(key, version), value) for key, value in data.items()], timeout)
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self._write() as db:
+            for chunk in _chunks(keys):
+                db.execute('DELETE FROM cache WHERE key IN (%s)' % ','.join('?' * len(chunk)), chunk)
+
+    def clear(self):
+        with self._write() as db:
+            db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # соединение живёт весь поток: открывать файл на каждый запрос дороже самих запросов
+        pass
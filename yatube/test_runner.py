@@ -0,0 +1,18 @@
+from django.test.runner import DiscoverRunner
+
+from .sandbox import temporary_storage
+
+
+class TemporaryStorageRunner(DiscoverRunner):
+    """
+    Запускает тесты с временными кешем и метриками, см. yatube/sandbox.py.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._storage = temporary_storage()
+        self._storage.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._storage.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
@@ -5,9 +5,12 @@ from django.urls import include, path
 from django.contrib.flatpages import views
 from django.conf.urls import handler404, handler500
 
+from .metrics import metrics_view
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
     path('', include('posts.urls')),
     path('group/<slug>/', include('posts.urls')),
     path('auth/', include('users.urls')),